@@ -0,0 +1,100 @@
+"""
+convert_df_to_bar 基准测试：逐行转换与按列转换的耗时对比
+
+python benchmarks/bench_convert_df_to_bar.py [rows ...]
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from vnpy.trader.constant import Exchange, Interval
+from vnpy.trader.object import BarData, HistoryRequest
+from vnpy.trader.utility import round_to
+
+from vnpy_akshare.akshre_feed import AKShareDataFeed, CHINA_TZ, INTERVAL_ADJUSTMENT_MAP, string_to_date
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+def make_bar_df(rows: int, seed: int = 0, decimals: int = 2) -> pd.DataFrame:
+    """
+    生成与ZhADataFeed.query_bar_history结构一致的合成日线
+    :param decimals: 价格的小数位数，超过6位时转换需要取整
+    """
+    rng = np.random.default_rng(seed)
+    # 日期超出pandas可表示范围时循环使用
+    dates = pd.date_range("1990-01-01", periods=min(rows, 80_000), freq="D").strftime("%Y-%m-%d")
+    dates = np.resize(dates.to_numpy(), rows)
+    close = np.round(10 + rng.standard_normal(rows).cumsum() * 0.01, decimals)
+    return pd.DataFrame({
+        "datetime": dates,
+        "open": close + 0.01,
+        "close": close,
+        "high": close + 0.02,
+        "low": close - 0.02,
+        "volume": rng.integers(1, 10 ** 6, rows).astype(float),
+        "turnover": rng.random(rows) * 10 ** 8,
+    })
+
+
+def convert_df_to_bar_rows(req: HistoryRequest, df: pd.DataFrame) -> List[BarData]:
+    """原逐行实现，作为对照"""
+    data: List[BarData] = []
+    interval: Interval = req.interval if req.interval is not None else Interval.DAILY
+    adjustment: timedelta = INTERVAL_ADJUSTMENT_MAP[interval]
+
+    df.fillna(0, inplace=True)
+    for row in df.itertuples():
+        dt: datetime = string_to_date(row.datetime)
+        dt: datetime = dt - adjustment
+        dt: datetime = CHINA_TZ.localize(dt)
+
+        bar: BarData = BarData(
+            symbol=req.symbol,
+            exchange=req.exchange,
+            interval=interval,
+            datetime=dt,
+            open_price=round_to(row.open, 0.000001),
+            high_price=round_to(row.high, 0.000001),
+            low_price=round_to(row.low, 0.000001),
+            close_price=round_to(row.close, 0.000001),
+            volume=row.volume,
+            turnover=row.turnover,
+            open_interest=getattr(row, "open_interest", 0),
+            gateway_name="AK"
+        )
+        data.append(bar)
+    return data
+
+
+def measure(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main(sizes: List[int]):
+    feed = AKShareDataFeed()
+    req = HistoryRequest("000001", Exchange.SZSE, datetime(1990, 1, 1), interval=Interval.DAILY)
+
+    # 结果一致性检查，8位小数的价格覆盖round_to的取整
+    for decimals in (2, 8):
+        sample = make_bar_df(10000, decimals=decimals)
+        expected = convert_df_to_bar_rows(req, sample.copy())
+        actual = feed.convert_df_to_bar(req, sample.copy())
+        assert expected == actual, "columnar conversion differs from row conversion (%d decimals)" % decimals
+
+    print("%10s %12s %12s %8s" % ("rows", "rows(s)", "columnar(s)", "speedup"))
+    for rows in sizes:
+        df = make_bar_df(rows)
+        row_cost = measure(convert_df_to_bar_rows, req, df.copy())
+        col_cost = measure(feed.convert_df_to_bar, req, df.copy())
+        print("%10d %12.3f %12.3f %7.1fx" % (rows, row_cost, col_cost, row_cost / col_cost))
+
+
+if __name__ == "__main__":
+    main([int(n) for n in sys.argv[1:]] or SIZES)
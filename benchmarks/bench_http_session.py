@@ -0,0 +1,85 @@
+"""
+HTTP长连接基准测试：在本地启动一个模拟数据源的HTTP服务，
+对比requests.get每次新建连接与安装共享连接池后的单次请求延迟
+
+python benchmarks/bench_http_session.py [requests] [connect_delay_ms]
+
+connect_delay_ms模拟远端数据源建立TCP/TLS连接的耗时，默认为0
+"""
+import json
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+import requests
+
+from vnpy_akshare.utils import http_pool
+
+CONNECT_DELAY = 0.0
+
+BODY = json.dumps({"data": [[i, i * 1.5] for i in range(100)]}).encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        time.sleep(CONNECT_DELAY)
+        super().setup()
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def measure(url: str, count: int) -> List[float]:
+    costs = []
+    for _ in range(count):
+        start = time.perf_counter()
+        requests.get(url).json()
+        costs.append(time.perf_counter() - start)
+    return costs
+
+
+def report(name: str, costs: List[float]):
+    costs = sorted(costs)
+    print("%-10s mean %.3fms  p50 %.3fms  p99 %.3fms" % (
+        name,
+        statistics.mean(costs) * 1000,
+        costs[len(costs) // 2] * 1000,
+        costs[int(len(costs) * 0.99)] * 1000,
+    ))
+
+
+def main(count: int):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://127.0.0.1:%d/" % server.server_address[1]
+
+    try:
+        report("new conn", measure(url, count))
+
+        http_pool.install(http_pool.SessionPool())
+        try:
+            with http_pool.scope():
+                report("pooled", measure(url, count))
+        finally:
+            http_pool.uninstall()
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        CONNECT_DELAY = float(sys.argv[2]) / 1000
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
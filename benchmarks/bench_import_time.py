@@ -0,0 +1,84 @@
+"""
+导入耗时检查：在子进程中用python -X importtime导入模块，超出预算或提前导入了重量级依赖时返回码为1
+
+python benchmarks/bench_import_time.py [--budget 毫秒] [--top 10] [模块 ...]
+"""
+import argparse
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+MODULES = ["vnpy_akshare.akshre_feed", "vnpy_akshare.wrap.jq_data"]
+
+# 只应在第一次使用时导入的模块
+HEAVY_MODULES = ["akshare", "dask", "distributed", "joblib", "diskcache", "logbook", "http.server"]
+
+DEFAULT_BUDGET_MS = 1500
+
+
+def measure(module: str) -> Tuple[Dict[str, int], List[str]]:
+    """
+    在新的解释器中导入module
+    :return: ({模块: 累计耗时微秒}, 导入后已加载的重量级模块)
+    """
+    code = (
+        "import sys, %s\n"
+        "print(' '.join(name for name in %r if name in sys.modules))"
+    ) % (module, HEAVY_MODULES)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError("import %s failed:\n%s" % (module, result.stderr))
+
+    # 格式：import time: self [us] | cumulative | imported package
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        cumulative[parts[2].strip()] = int(parts[1])
+    return cumulative, result.stdout.split()
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_MS, help="每个模块的导入耗时预算，毫秒")
+    parser.add_argument("--top", type=int, default=10, help="显示耗时最多的模块数")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.modules:
+        cumulative, loaded = measure(module)
+        total_ms = cumulative.get(module, 0) / 1000
+
+        status = "ok"
+        if total_ms > args.budget:
+            status = "OVER BUDGET"
+            failed = True
+        if loaded:
+            status = "EAGER IMPORT"
+            failed = True
+
+        print("%-36s %10.1f ms  budget %.0f ms  %s" % (module, total_ms, args.budget, status))
+        if loaded:
+            print("    eagerly imported: %s" % ", ".join(loaded))
+
+        # 只列出顶层包，避免子模块重复计入
+        packages = {}
+        for name, us in cumulative.items():
+            top = name.split(".")[0]
+            if name == top:
+                packages[top] = us
+        for name, us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+            print("    %-32s %10.1f ms" % (name, us / 1000))
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
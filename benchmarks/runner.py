@@ -0,0 +1,175 @@
+"""
+基准测试运行器：注册、计时、保存历史结果并与上一次结果对比
+
+每个基准测试是一个接收参数的函数，完成准备工作后返回被计时的函数，
+或者(被计时的函数, 每轮计时前调用的重置函数)。
+结果追加保存在history.jsonl中，同一台机器上耗时超过上一次threshold倍的项会被标记为退化。
+"""
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "history.jsonl")
+
+BENCHMARKS: List["Benchmark"] = []
+
+
+class Benchmark:
+    def __init__(self, name: str, func: Callable, params: list):
+        self.name: str = name
+        self.func: Callable = func
+        self.params: list = params
+
+    def cases(self):
+        if not self.params:
+            yield self.name, None
+        for param in self.params:
+            yield "%s[%s]" % (self.name, param), param
+
+
+def benchmark(name: str, params: list = None):
+    """注册基准测试"""
+
+    def register(func: Callable) -> Callable:
+        BENCHMARKS.append(Benchmark(name, func, params or []))
+        return func
+
+    return register
+
+
+def timeit(func: Callable, reset: Optional[Callable], repeat: int, min_time: float) -> List[float]:
+    """返回每轮中单次调用的平均耗时，每轮调用次数自动确定，使一轮耗时不少于min_time"""
+    number = 1
+    while True:
+        if reset:
+            reset()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        cost = time.perf_counter() - start
+        # 有重置函数时每轮只能调用一次
+        if reset or cost >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(cost, 1e-9)))
+
+    costs = [cost / number]
+    for _ in range(repeat - 1):
+        if reset:
+            reset()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        costs.append((time.perf_counter() - start) / number)
+    return costs
+
+
+def machine_id() -> str:
+    return "%s-%s-%s" % (platform.node(), platform.machine(), platform.python_version())
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def load_history(path: str) -> List[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_history(path: str, record: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def find_baseline(history: List[dict], machine: str) -> Dict[str, dict]:
+    """同一台机器上每一项最近一次的结果"""
+    baseline = {}
+    for record in history:
+        if record["machine"] == machine:
+            baseline.update(record["results"])
+    return baseline
+
+
+def run(pattern: str = "*", repeat: int = 5, min_time: float = 0.2) -> Dict[str, dict]:
+    results = {}
+    for bench in BENCHMARKS:
+        for name, param in bench.cases():
+            if not fnmatch.fnmatch(name, pattern):
+                continue
+            try:
+                target = bench.func(param) if bench.params else bench.func()
+            except ImportError as ex:
+                print("%-45s skipped: %s" % (name, ex))
+                continue
+
+            func, reset = target if isinstance(target, tuple) else (target, None)
+            try:
+                costs = timeit(func, reset, repeat, min_time)
+            except ImportError as ex:
+                # 依赖在第一次调用时才导入
+                print("%-45s skipped: %s" % (name, ex))
+                continue
+            results[name] = {"min": min(costs), "median": statistics.median(costs)}
+            print("%-45s min %12.6fms  median %12.6fms" % (name, min(costs) * 1000, statistics.median(costs) * 1000))
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """返回耗时超过基线threshold倍的项"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        ratio = result["min"] / base["min"]
+        if ratio > threshold:
+            regressions.append(name)
+            print("REGRESSION %-34s %.2fx (%.6fms -> %.6fms)" % (
+                name, ratio, base["min"] * 1000, result["min"] * 1000))
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-k", "--filter", default="*", help="按名称筛选，支持通配符")
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="每轮最少耗时，秒")
+    parser.add_argument("--threshold", type=float, default=1.25, help="判定为退化的耗时倍数")
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--no-save", action="store_true", help="不保存本次结果")
+    args = parser.parse_args(argv)
+
+    machine = machine_id()
+    baseline = find_baseline(load_history(args.history), machine)
+
+    results = run(args.filter, args.repeat, args.min_time)
+    regressions = compare(results, baseline, args.threshold)
+
+    if not args.no_save and results:
+        save_history(args.history, {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "machine": machine,
+            "results": results,
+        })
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
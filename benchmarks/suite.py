@@ -0,0 +1,248 @@
+"""
+热点路径基准测试集，全部使用合成数据，不访问网络
+
+python benchmarks/suite.py [-k 名称通配符] [--threshold 1.25] [--no-save]
+
+结果追加保存在benchmarks/results/history.jsonl，存在退化项时返回码为1
+"""
+import atexit
+import datetime as dt
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from runner import benchmark, main
+
+SYMBOL_COUNT = 5000
+CODE_COUNT = 300
+
+
+@benchmark("convert_df_to_bar", params=[1_000, 10_000, 100_000])
+def bench_convert_df_to_bar(rows):
+    from vnpy.trader.constant import Exchange, Interval
+    from vnpy.trader.object import HistoryRequest
+
+    from bench_convert_df_to_bar import make_bar_df
+    from vnpy_akshare.akshre_feed import AKShareDataFeed
+
+    feed = AKShareDataFeed()
+    req = HistoryRequest("000001", Exchange.SZSE, dt.datetime(1990, 1, 1), interval=Interval.DAILY)
+    df = make_bar_df(rows)
+    return lambda: feed.convert_df_to_bar(req, df.copy())
+
+
+@benchmark("get_trade_date", params=["month", "year", "decade"])
+def bench_get_trade_date(span):
+    from vnpy.trader.constant import Exchange
+
+    from vnpy_akshare.akshre_feed import Country, country_trade_calendar, get_trade_date
+
+    # 直接填入合成的交易日，避免读取本地文件或下载
+    calendar = country_trade_calendar[Country.China]
+    calendar.dates = pd.bdate_range("1990-01-01", "2030-12-31").to_pydatetime().tolist()
+
+    start = dt.datetime(2010, 3, 1)
+    end = start + {"month": dt.timedelta(30), "year": dt.timedelta(365), "decade": dt.timedelta(3650)}[span]
+    return lambda: get_trade_date(Exchange.SSE, start, end)
+
+
+@benchmark("date_utils.trade_range", params=[30, 365])
+def bench_trade_range(days):
+    import vnpy_akshare.utils.date_utils as du
+
+    start = dt.datetime(2019, 1, 1)
+    end = start + dt.timedelta(days)
+    return lambda: list(du.trade_range(start, end))
+
+
+@benchmark("date_utils.next_trade_day", params=[1, 20, -20])
+def bench_next_trade_day(count):
+    import vnpy_akshare.utils.date_utils as du
+
+    day = dt.datetime(2019, 9, 27)
+    return lambda: du.next_trade_day(day, count)
+
+
+@benchmark("date_utils.to_date", params=["str", "int", "date", "list"])
+def bench_to_date(kind):
+    import vnpy_akshare.utils.date_utils as du
+
+    value = {
+        "str": "2019-09-27",
+        "int": 20190927,
+        "date": dt.date(2019, 9, 27),
+        "list": ["2019-09-%02d" % d for d in range(1, 31)],
+    }[kind]
+    return lambda: du.to_date(value)
+
+
+def make_wrap():
+    """使用临时目录下diskcache的Wrap"""
+    from diskcache import Cache
+
+    from vnpy_akshare.wrap.wrap import Wrap
+
+    class BenchWrap(Wrap):
+        def __init__(self, path):
+            self.cache = Cache(path)
+
+        def get_cache(self, key):
+            return self.cache.get(key)
+
+        def put_cache(self, key, value):
+            self.cache.set(key, value)
+
+    path = tempfile.mkdtemp(prefix="bench_wrap_")
+    return BenchWrap(path), path
+
+
+def make_daily_source(code_count, cache_prefix=None):
+    """
+    get_cached_data使用的合成日线数据源，code_count个代码，每个交易日一行
+    :param cache_prefix: 不为None时设置为gen_key.cache_prefix，使Wrap.cache_backend生效
+    :return: (gen_key, filter_stocks, get_and_process_data)
+    """
+    import vnpy_akshare.utils.date_utils as du
+
+    codes = ["%06d.s" % i for i in range(code_count)]
+
+    def gen_key(day):
+        return "daily_" + du.to_str(day) + "_pre"
+
+    if cache_prefix is not None:
+        gen_key.cache_prefix = cache_prefix
+
+    def filter_stocks(start_date, end_date, need):
+        return codes
+
+    def get_and_process_data(securities, start_date, end_date):
+        days = list(du.trade_range(start_date, end_date))
+        rng = np.random.default_rng(0)
+        return pd.DataFrame({
+            "code": np.repeat(securities, len(days)),
+            "date": np.tile(np.array(days, dtype="datetime64[ns]"), len(securities)),
+            "close": rng.random(len(securities) * len(days)),
+        })
+
+    return gen_key, filter_stocks, get_and_process_data
+
+
+def clear_result_cache():
+    """清空get_cached_data的进程内结果缓存，使计时落在diskcache上"""
+    from vnpy_akshare.wrap.wrap import get_result_cache
+
+    get_result_cache().clear()
+
+
+@benchmark("wrap.get_cached_data", params=["cold", "warm", "result", "sub_range"])
+def bench_get_cached_data(state):
+    """cold: 全部下载，warm: 读取diskcache，result: 命中结果缓存，sub_range: 从结果缓存截取子区间"""
+    wrap, path = make_wrap()
+    gen_key, filter_stocks, get_and_process_data = make_daily_source(CODE_COUNT)
+
+    start, end = dt.datetime(2020, 1, 1), dt.datetime(2020, 3, 31)
+
+    def query(query_start=start, query_end=end):
+        wrap.get_cached_data(query_start, query_end, gen_key, filter_stocks, get_and_process_data, True, True, False)
+
+    def reset():
+        clear_result_cache()
+        if state == "cold":
+            wrap.cache.clear()
+
+    # 临时目录在进程退出时删除
+    atexit.register(shutil.rmtree, path, True)
+    if state == "cold":
+        return query, reset
+    query()
+    if state == "warm":
+        return query, reset
+    if state == "result":
+        return query
+    return lambda: query(dt.datetime(2020, 2, 1), dt.datetime(2020, 2, 29))
+
+
+@benchmark("wrap.cache_backend", params=["diskcache", "parquet"])
+def bench_cache_backend(backend):
+    """两年的数据已全部缓存时，逐日读取diskcache与按年读取Parquet的对比"""
+    from vnpy_akshare.wrap.cache_backend import ParquetCacheBackend
+
+    wrap, path = make_wrap()
+    if backend == "parquet":
+        wrap.cache_backend = ParquetCacheBackend(path + "_parquet")
+        atexit.register(shutil.rmtree, path + "_parquet", True)
+    atexit.register(shutil.rmtree, path, True)
+    gen_key, filter_stocks, get_and_process_data = make_daily_source(CODE_COUNT, "daily_pre")
+
+    start, end = dt.datetime(2018, 1, 1), dt.datetime(2019, 12, 31)
+
+    def query():
+        wrap.get_cached_data(start, end, gen_key, filter_stocks, get_and_process_data, True, True, False)
+
+    query()
+    return query, clear_result_cache
+
+
+@benchmark("wrap.coverage", params=[250, 2500])
+def bench_coverage(days):
+    """由清单计算缺口：每10个交易日缺1天"""
+    import vnpy_akshare.utils.date_utils as du
+    from vnpy_akshare.wrap.cache_backend import Coverage
+
+    trade_days = list(du.trade_range(dt.datetime(2010, 1, 1), dt.datetime(2022, 12, 31)))[:days]
+    coverage = Coverage()
+    for i in range(0, len(trade_days), 10):
+        coverage.add(trade_days[i], trade_days[min(i + 8, len(trade_days) - 1)])
+    return lambda: [day for day in trade_days if not coverage.covers(day)]
+
+
+def make_symbols(count: int):
+    """股票、指数、ETF混合的合成代码"""
+    symbols = []
+    for i in range(count):
+        if i % 10 == 0:
+            symbols.append("%06d.i" % i)
+        elif i % 10 == 1:
+            symbols.append("51%04d" % (i % 10000))
+        elif i % 2:
+            symbols.append("%06d" % i)
+        else:
+            symbols.append("%06d.s" % (600000 + i))
+    return symbols
+
+
+@benchmark("wrap.get_symbol_info", params=[SYMBOL_COUNT])
+def bench_get_symbol_info(count):
+    from vnpy_akshare.wrap.wrap import Wrap
+
+    wrap = Wrap()
+    symbols = make_symbols(count)
+    return lambda: wrap.get_symbol_info(symbols)
+
+
+@benchmark("wrap.make_symbol", params=[SYMBOL_COUNT])
+def bench_make_symbol(count):
+    from vnpy_akshare.wrap.wrap import Wrap
+
+    wrap = Wrap()
+    symbols = make_symbols(count)
+    return lambda: wrap._make_symbol(wrap.get_symbol_info(symbols))
+
+
+@benchmark("parallelize_dataframe", params=[100_000])
+def bench_parallelize_dataframe(rows):
+    # thread_util在调用时才导入dask和joblib，缺少依赖时在这里跳过
+    import dask  # noqa: F401
+    import joblib  # noqa: F401
+
+    from vnpy_akshare.utils.thread_util import parallelize_dataframe
+
+    df = pd.DataFrame({"close": np.random.default_rng(0).random(rows)})
+    return lambda: parallelize_dataframe(df, lambda d: d * 2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+import threading
+
+import pytest
+
+
+def _run_concurrently(func, n=8):
+    """n个线程同时调用func(i)，返回每个线程的结果或抛出的异常"""
+    results = [None] * n
+    barrier = threading.Barrier(n)
+
+    def target(i):
+        barrier.wait()
+        try:
+            results[i] = func(i)
+        except Exception as ex:
+            results[i] = ex
+
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+@pytest.fixture
+def run_concurrently():
+    return _run_concurrently
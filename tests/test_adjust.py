@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from vnpy_akshare.adjust import ADJUST_HFQ, ADJUST_QFQ, adjust_df
+from vnpy_akshare.utils.compact import compact_df
+
+# 未复权日线和累计后复权因子，2020-07-10除权
+RAW = pd.DataFrame({
+    "datetime": ["2020-07-09", "2020-07-10", "2020-07-13"],
+    "open": [9.96, 10.02, 10.35],
+    "high": [10.08, 10.41, 10.36],
+    "low": [9.90, 9.98, 9.81],
+    "close": [10.01, 10.37, 9.88],
+    "volume": [1000.0, 1200.0, 900.0],
+})
+FACTOR = pd.DataFrame({
+    "date": pd.to_datetime(["2000-01-04", "2020-07-10"]),
+    "factor": [3.0, 3.1237],
+})
+
+# 上游复权价格的口径：原价乘以因子后四舍五入到分
+HFQ_CLOSE = [30.03, 32.39, 30.86]
+QFQ_CLOSE = [9.61, 10.37, 9.88]
+
+
+def test_adjust_hfq():
+    df = adjust_df(RAW, FACTOR, ADJUST_HFQ)
+    assert df["close"].tolist() == HFQ_CLOSE
+    assert df["open"].tolist() == [29.88, 31.3, 32.33]
+    # 成交量不复权，原数据不修改
+    assert df["volume"].tolist() == RAW["volume"].tolist()
+    assert RAW["close"].tolist() == [10.01, 10.37, 9.88]
+
+
+def test_adjust_qfq():
+    df = adjust_df(RAW, FACTOR, ADJUST_QFQ)
+    assert df["close"].tolist() == QFQ_CLOSE
+    assert df["low"].tolist() == [9.51, 9.98, 9.81]
+
+
+def test_adjusted_prices_compact_to_float32():
+    df = compact_df(adjust_df(RAW, FACTOR, ADJUST_HFQ))
+    for name in ("open", "high", "low", "close"):
+        assert df[name].dtype == np.float32
@@ -0,0 +1,71 @@
+import time
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("vnpy")
+
+from vnpy.trader.constant import Exchange, Interval
+from vnpy.trader.object import HistoryRequest
+
+import vnpy_akshare.akshre_feed as akshre_feed
+
+from test_iter_bar_history import fake_daily
+
+
+@pytest.fixture
+def datafeed():
+    datafeed = akshre_feed.AKShareDataFeed()
+    datafeed.store = None
+    return datafeed
+
+
+def make_feed(adjust, calls, error=None):
+    feed = akshre_feed.ZhADataFeed(adjust)
+
+    def query_bar_history(req, compact=False):
+        calls.append(feed.adjust)
+        time.sleep(0.3)
+        if error is not None:
+            raise error
+        return fake_daily(req)
+
+    feed.query_bar_history = query_bar_history
+    return feed
+
+
+REQ = HistoryRequest("000001", Exchange.SZSE, datetime(2020, 1, 6), datetime(2020, 1, 31), interval=Interval.DAILY)
+
+
+def test_query_bar_df_coalesces(datafeed, run_concurrently):
+    calls = []
+    feed = make_feed("hfq", calls)
+
+    results = run_concurrently(lambda i: datafeed.query_bar_df(REQ, feed=feed))
+
+    assert calls == ["hfq"]
+    assert all(len(df) == 20 for df in results)
+    # 共享的结果各自独立，修改一个不影响其他
+    results[0].loc[0, "close"] = 0
+    assert all(df.loc[0, "close"] == 10.5 for df in results[1:])
+
+
+def test_query_bar_df_error_reaches_every_waiter(datafeed, run_concurrently):
+    calls = []
+    error = ConnectionError("upstream down")
+    feed = make_feed("hfq", calls, error)
+
+    results = run_concurrently(lambda i: datafeed.query_bar_df(REQ, feed=feed))
+
+    assert calls == ["hfq"]
+    assert all(result is error for result in results)
+
+
+def test_query_bar_df_separate_flight_per_adjust(datafeed, run_concurrently):
+    calls = []
+    feeds = [make_feed("hfq", calls), make_feed("qfq", calls)]
+
+    results = run_concurrently(lambda i: datafeed.query_bar_df(REQ, feed=feeds[i % 2]))
+
+    assert sorted(calls) == ["hfq", "qfq"]
+    assert all(len(df) == 20 for df in results)
@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# 与benchmarks/bench_import_time.py的默认预算一致，单位毫秒
+BUDGET_MS = 1500
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_in_subprocess(module, watched):
+    """
+    在新的解释器中用-X importtime导入module
+    :return: (module的累计导入耗时毫秒, 导入后已加载的watched模块)
+    """
+    code = "import sys, %s\nprint(' '.join(name for name in %r if name in sys.modules))" % (module, watched)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([ROOT] + [p for p in env.get("PYTHONPATH", "").split(os.pathsep) if p])
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, env=env
+    )
+    assert result.returncode == 0, result.stderr
+
+    # 格式：import time: self [us] | cumulative | imported package
+    cumulative_us = 0
+    for line in result.stderr.splitlines():
+        parts = line[len("import time:"):].split("|")
+        if line.startswith("import time:") and len(parts) == 3 and parts[2].strip() == module:
+            cumulative_us = int(parts[1])
+    return cumulative_us / 1000, result.stdout.split()
+
+
+def test_package_import_is_light():
+    ms, loaded = import_in_subprocess("vnpy_akshare", ["pandas", "akshare", "diskcache", "pyarrow"])
+
+    assert loaded == []
+    assert 0 < ms < BUDGET_MS
+
+
+@pytest.mark.parametrize("module", ["vnpy_akshare.akshre_feed", "vnpy_akshare.wrap.jq_data"])
+def test_feed_import_defers_heavy_modules(module):
+    pytest.importorskip("vnpy")
+    # 数据源模块需要pandas，安装了pyarrow时pandas会一并导入，这里不检查
+    ms, loaded = import_in_subprocess(module, ["akshare", "diskcache", "dask", "joblib", "logbook"])
+
+    assert loaded == []
+    assert 0 < ms < BUDGET_MS
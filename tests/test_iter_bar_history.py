@@ -0,0 +1,68 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("vnpy")
+
+from vnpy.trader.constant import Exchange, Interval
+from vnpy.trader.object import HistoryRequest
+
+import vnpy_akshare.akshre_feed as akshre_feed
+
+
+def fake_daily(req):
+    """工作日的合成日线，不访问网络"""
+    days = pd.bdate_range(req.start.date(), (req.end or datetime.now()).date())
+    return pd.DataFrame({
+        "datetime": days.strftime("%Y-%m-%d"),
+        "open": 10.0,
+        "close": 10.5,
+        "high": 11.0,
+        "low": 9.5,
+        "volume": 100.0,
+        "turnover": 1000.0,
+    })
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    feed = akshre_feed.AKShareDataFeed()
+    feed.store = None
+    monkeypatch.setattr(akshre_feed.FEEDS[Exchange.SZSE], "query_bar_history",
+                        lambda req, compact=False: fake_daily(req))
+    return feed
+
+
+def bar_tuples(bars):
+    return [(bar.datetime, bar.open_price, bar.close_price, bar.volume) for bar in bars]
+
+
+@pytest.mark.parametrize("interval", [Interval.DAILY, Interval.WEEKLY])
+@pytest.mark.parametrize("chunk", ["year", "month"])
+def test_chunked_matches_unchunked(feed, interval, chunk):
+    # 2019-12-30至2020-01-03这一周跨越年、月边界
+    req = HistoryRequest("000001", Exchange.SZSE, datetime(2019, 11, 4), datetime(2020, 1, 31), interval=interval)
+
+    expected = feed.query_bar_history(req)
+    chunked = [bar for bars in feed.iter_bar_history(req, chunk=chunk) for bar in bars]
+
+    assert bar_tuples(chunked) == bar_tuples(expected)
+
+
+def test_split_date_range_align_week():
+    ranges = akshre_feed.split_date_range(datetime(2019, 11, 4), datetime(2020, 1, 31), "year", align_week=True)
+
+    assert ranges[1][0] == datetime(2019, 12, 30)
+    assert ranges[0][1] < ranges[1][0]
+
+
+def test_unsupported_interval_is_not_fetched(feed, monkeypatch):
+    future_feed = akshre_feed.FEEDS[Exchange.SHFE]
+    calls = []
+    monkeypatch.setattr(future_feed, "query_bar_history", lambda req, compact=False: calls.append(req))
+
+    req = HistoryRequest("rb2101", Exchange.SHFE, datetime(2020, 1, 6), datetime(2020, 1, 10), interval=Interval.HOUR)
+
+    assert feed.query_bar_df(req) is None
+    assert calls == []
@@ -0,0 +1,79 @@
+import pytest
+
+from vnpy_akshare.utils.rate_limit import AdaptiveLimiter
+
+
+def make_limiter():
+    # 令牌充足，测试中不等待
+    return AdaptiveLimiter("test", rate=8.0, burst=1000, min_rate=1.0, max_rate=16.0,
+                           concurrency=8, min_concurrency=1, max_concurrency=16,
+                           failure_types=(OSError,))
+
+
+def fail(error):
+    def func():
+        raise error
+    return func
+
+
+def test_network_error_backs_off():
+    limiter = make_limiter()
+
+    with pytest.raises(ConnectionError):
+        limiter.call(fail(ConnectionError("reset")))
+
+    assert limiter.limit == 4
+    assert limiter.rate == 4.0
+    assert limiter.failure_count == 1
+    assert limiter.active == 0
+
+
+def test_other_error_does_not_back_off():
+    limiter = make_limiter()
+
+    with pytest.raises(KeyError):
+        limiter.call(fail(KeyError("close")))
+
+    assert limiter.limit == 8
+    assert limiter.rate == 8.0
+    assert limiter.failure_count == 0
+    assert limiter.active == 0
+
+
+def test_concurrent_failures_back_off_once():
+    limiter = make_limiter()
+    starts = [limiter.acquire() for _ in range(3)]
+
+    for start in starts:
+        limiter.release(start, False)
+
+    assert limiter.limit == 4
+    assert limiter.failure_count == 3
+
+
+def test_recovers_after_success():
+    limiter = make_limiter()
+    with pytest.raises(TimeoutError):
+        limiter.call(fail(TimeoutError()))
+    limit, rate = limiter.limit, limiter.rate
+
+    for _ in range(20):
+        assert limiter.call(lambda: "ok") == "ok"
+
+    assert limiter.limit > limit
+    assert limiter.rate > rate
+    assert limiter.success_count == 20
+
+
+def test_limits_stay_in_bounds():
+    limiter = make_limiter()
+    for _ in range(10):
+        with pytest.raises(OSError):
+            limiter.call(fail(OSError()))
+    assert limiter.limit == 1
+    assert limiter.rate == 1.0
+
+    for _ in range(1000):
+        limiter.call(lambda: None)
+    assert limiter.limit == 16
+    assert limiter.rate == 16.0
@@ -0,0 +1,78 @@
+import pandas as pd
+
+from vnpy_akshare.utils.result_cache import ResultCache, _Entry
+
+
+def make_df(start, end, codes=("000001",)):
+    days = pd.bdate_range(start, end)
+    return pd.DataFrame({
+        "date": [day for day in days for _ in codes],
+        "code": [code for _ in days for code in codes],
+        "close": 1.0,
+    })
+
+
+def entry_bytes(df):
+    return _Entry(df["date"].min(), df["date"].max(), None, df, "date").nbytes
+
+
+def test_sub_range_hit():
+    cache = ResultCache(10 ** 6)
+    df = make_df("2020-01-01", "2020-01-31")
+    cache.put("key", "2020-01-01", "2020-01-31", df)
+
+    assert cache.get("key", "2020-01-01", "2020-01-31") is df
+    part = cache.get("key", "2020-01-06", "2020-01-10")
+    assert part["date"].tolist() == list(pd.bdate_range("2020-01-06", "2020-01-10"))
+    assert cache.get("key", "2019-12-31", "2020-01-10") is None
+    assert cache.get("other", "2020-01-06", "2020-01-10") is None
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (2, 2)
+
+
+def test_universe_must_be_contained():
+    cache = ResultCache(10 ** 6)
+    cache.put("key", "2020-01-01", "2020-01-31", make_df("2020-01-01", "2020-01-31"), frozenset({"a", "b"}))
+
+    assert cache.get("key", "2020-01-06", "2020-01-10", frozenset({"a"})) is not None
+    assert cache.get("key", "2020-01-06", "2020-01-10", frozenset({"a", "c"})) is None
+
+
+def test_evicts_least_recently_used_by_bytes():
+    frames = {name: make_df("2020-01-01", "2020-01-31") for name in "abc"}
+    size = entry_bytes(frames["a"])
+    cache = ResultCache(size * 2 + size // 2)
+
+    cache.put("a", "2020-01-01", "2020-01-31", frames["a"])
+    cache.put("b", "2020-01-01", "2020-01-31", frames["b"])
+    # 访问a后b成为最久未使用的结果
+    assert cache.get("a", "2020-01-01", "2020-01-31") is not None
+    cache.put("c", "2020-01-01", "2020-01-31", frames["c"])
+
+    assert cache.get("b", "2020-01-01", "2020-01-31") is None
+    assert cache.get("a", "2020-01-01", "2020-01-31") is not None
+    assert cache.get("c", "2020-01-01", "2020-01-31") is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+    assert stats["bytes"] == size * 2 <= stats["max_bytes"]
+
+
+def test_oversized_result_not_cached():
+    df = make_df("2020-01-01", "2020-12-31")
+    cache = ResultCache(entry_bytes(df) - 1)
+
+    cache.put("key", "2020-01-01", "2020-12-31", df)
+
+    assert cache.stats()["entries"] == 0
+    assert cache.get("key", "2020-01-01", "2020-12-31") is None
+
+
+def test_wider_result_replaces_contained():
+    cache = ResultCache(10 ** 6)
+    cache.put("key", "2020-01-06", "2020-01-10", make_df("2020-01-06", "2020-01-10"))
+    wide = make_df("2020-01-01", "2020-01-31")
+    cache.put("key", "2020-01-01", "2020-01-31", wide)
+
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["bytes"] == entry_bytes(wide)
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("vnpy")
+
+from vnpy.trader.utility import round_to
+
+from vnpy_akshare.akshre_feed import PRICE_TICK, round_prices
+
+
+def test_matches_round_to():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([
+        np.round(rng.random(20000) * 100, 7),
+        np.round(rng.random(20000) * 100, 2),
+        [0.1 + 0.2, -2.5e-6, 3.5e-6, 0.0],
+    ])
+
+    expected = [round_to(value, PRICE_TICK) for value in values.tolist()]
+
+    assert round_prices(values).tolist() == expected
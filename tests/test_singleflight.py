@@ -0,0 +1,66 @@
+import time
+
+from vnpy_akshare.utils.singleflight import SingleFlight
+
+
+def slow(calls, value=None, error=None):
+    def func(*args, **kwargs):
+        calls.append(args)
+        time.sleep(0.3)
+        if error is not None:
+            raise error
+        return value
+    return func
+
+
+def test_identical_calls_run_once(run_concurrently):
+    flights = SingleFlight()
+    calls = []
+    func = slow(calls, "data")
+
+    results = run_concurrently(lambda i: flights.do("key", func, 1, 10))
+
+    assert len(calls) == 1
+    assert [value for value, _ in results] == ["data"] * len(results)
+    assert sorted(shared for _, shared in results) == [False] + [True] * (len(results) - 1)
+
+
+def test_contained_range_shares_call(run_concurrently):
+    flights = SingleFlight()
+    calls = []
+    func = slow(calls, "data")
+
+    def call(i):
+        if i == 0:
+            return flights.do("key", func, 1, 10)
+        # 等第一个请求开始执行
+        time.sleep(0.1)
+        return flights.do("key", func, 3, 5)
+
+    results = run_concurrently(call, n=2)
+
+    assert len(calls) == 1
+    assert results == [("data", False), ("data", True)]
+
+
+def test_different_keys_run_separately(run_concurrently):
+    flights = SingleFlight()
+    calls = []
+    func = slow(calls, "data")
+
+    run_concurrently(lambda i: flights.do(i % 2, func), n=4)
+
+    assert len(calls) == 2
+
+
+def test_error_reaches_every_waiter(run_concurrently):
+    flights = SingleFlight()
+    calls = []
+    error = ConnectionError("upstream down")
+
+    results = run_concurrently(lambda i: flights.do("key", slow(calls, error=error)))
+
+    assert len(calls) == 1
+    assert all(result is error for result in results)
+    # 失败的请求不保留，之后的调用重新执行
+    assert flights.do("key", lambda: "retry") == ("retry", False)
@@ -0,0 +1,148 @@
+import threading
+import time
+
+from vnpy_akshare.utils.write_behind import WriteBehind
+
+
+def slow_write(out, value, delay=0.05):
+    time.sleep(delay)
+    out.append(value)
+
+
+def test_submit_does_not_wait():
+    wb = WriteBehind()
+    out = []
+    start = time.monotonic()
+    for i in range(5):
+        wb.submit(slow_write, out, i)
+
+    assert time.monotonic() - start < 0.2
+    assert wb.pending() > 0
+    wb.close()
+
+
+def test_flush_waits_for_all_writes_in_order():
+    wb = WriteBehind()
+    out = []
+    for i in range(5):
+        wb.submit(slow_write, out, i)
+
+    wb.flush()
+
+    assert out == [0, 1, 2, 3, 4]
+    assert wb.pending() == 0
+    wb.close()
+
+
+def test_close_writes_pending_then_stops():
+    wb = WriteBehind()
+    out = []
+    for i in range(5):
+        wb.submit(slow_write, out, i)
+    thread = wb.thread
+
+    wb.close()
+
+    assert out == [0, 1, 2, 3, 4]
+    assert not thread.is_alive()
+    assert wb.pending() == 0
+
+    # 关闭后仍可提交，后台线程重新启动
+    wb.submit(slow_write, out, 5, 0)
+    wb.close()
+    assert out[-1] == 5
+
+
+def test_failed_write_does_not_stop_queue():
+    wb = WriteBehind()
+    out = []
+
+    def fail():
+        raise IOError("disk full")
+
+    wb.submit(fail)
+    wb.submit(slow_write, out, "after", 0)
+    wb.flush()
+
+    assert out == ["after"]
+    wb.close()
+
+
+def test_full_queue_blocks_submit():
+    wb = WriteBehind(maxsize=1)
+    release = threading.Event()
+    wb.submit(release.wait)
+    # 第一个任务已被取出执行，第二个占满队列
+    time.sleep(0.05)
+    wb.submit(lambda: None)
+
+    submitted = threading.Event()
+    threading.Thread(target=lambda: (wb.submit(lambda: None), submitted.set()), daemon=True).start()
+    assert not submitted.wait(0.1)
+
+    release.set()
+    assert submitted.wait(1)
+    wb.close()
+
+
+def test_pending_writes_visible_to_readers():
+    import datetime as dt
+
+    import numpy as np
+    import pandas as pd
+
+    import vnpy_akshare.utils.date_utils as du
+    from vnpy_akshare.wrap import wrap
+
+    release = threading.Event()
+
+    class DictWrap(wrap.Wrap):
+        write_behind = True
+
+        def __init__(self):
+            self.cache = {}
+
+        def get_cache(self, key):
+            return self.cache.get(key)
+
+        def put_cache(self, key, value):
+            release.wait()
+            self.cache[key] = value
+
+    calls = []
+
+    def gen_key(day):
+        return "daily_" + du.to_str(day)
+
+    gen_key.cache_prefix = "daily"
+
+    def get_and_process_data(securities, start_date, end_date):
+        calls.append((start_date, end_date))
+        days = list(du.trade_range(start_date, end_date))
+        return pd.DataFrame({
+            "code": np.repeat(securities, len(days)),
+            "date": np.tile(np.array(days, dtype="datetime64[ns]"), len(securities)),
+            "close": 1.0,
+        })
+
+    w = DictWrap()
+    start, end = dt.datetime(2020, 1, 1), dt.datetime(2020, 3, 31)
+
+    def query():
+        wrap.get_result_cache().clear()
+        return w.get_cached_data(start, end, gen_key, lambda s, e, n: ["a", "b"], get_and_process_data,
+                                 True, True, False)
+
+    try:
+        first = query()
+        # 后台写入尚未完成时再次读取，不重新下载
+        second = query()
+        assert len(calls) == 1
+        assert second.equals(first)
+    finally:
+        release.set()
+        wrap.get_write_behind().flush()
+
+    third = query()
+    assert len(calls) == 1
+    assert third.equals(first)
@@ -0,0 +1,60 @@
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+from numpy import ndarray
+from pandas import DataFrame
+
+ADJUST_NONE = ""
+ADJUST_QFQ = "qfq"
+ADJUST_HFQ = "hfq"
+
+ADJUST_PRICE_COLUMNS = ("open", "high", "low", "close")
+
+# 与上游复权价格一致，保留到分
+ADJUST_PRICE_DECIMALS = 2
+
+
+def factor_at(days: ndarray, factor_dates: ndarray, factor_values: ndarray) -> ndarray:
+    """
+    查找每个交易日生效的后复权因子
+    :param days: datetime64数组
+    :param factor_dates: 因子生效日期，升序
+    :param factor_values: 对应的累计后复权因子
+    :return: 与days等长的因子，早于第一个因子生效日期的为1
+    """
+    if len(factor_values) == 0:
+        return np.ones(len(days))
+    index = np.searchsorted(factor_dates, days, side="right") - 1
+    return np.where(index >= 0, factor_values[np.maximum(index, 0)], 1.0)
+
+
+def adjust_df(df: DataFrame, factor_df: DataFrame, adjust: str,
+              columns: Sequence[str] = ADJUST_PRICE_COLUMNS, decimals: int = ADJUST_PRICE_DECIMALS) -> DataFrame:
+    """
+    由未复权K线和后复权因子计算复权价格，结果按decimals位小数四舍五入
+    后复权价格 = 原价 * 当日因子，前复权价格 = 原价 * 当日因子 / 最新因子
+    :param df: 包含datetime列的未复权K线
+    :param factor_df: date和factor两列，date升序
+    :param adjust: "qfq"、"hfq"，或""表示不复权
+    :return: 新的DataFrame，不修改df
+    """
+    if not adjust or df is None or len(df) == 0:
+        return df
+
+    if adjust not in (ADJUST_QFQ, ADJUST_HFQ):
+        raise ValueError("unsupported adjust %s" % adjust)
+
+    factor_dates = factor_df["date"].to_numpy(dtype="datetime64[ns]")
+    factor_values = factor_df["factor"].to_numpy(dtype=np.float64)
+
+    days = pd.to_datetime(df["datetime"]).dt.normalize().to_numpy(dtype="datetime64[ns]")
+    factors = factor_at(days, factor_dates, factor_values)
+    if adjust == ADJUST_QFQ and len(factor_values) > 0:
+        factors = factors / factor_values[-1]
+
+    df = df.copy()
+    for name in columns:
+        if name in df.columns:
+            df[name] = np.round(df[name].to_numpy(dtype=np.float64) * factors, decimals)
+    return df
@@ -1,21 +1,38 @@
 import dataclasses
-from datetime import datetime, timedelta
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 from enum import Enum
-from typing import Dict, List, Optional
+from functools import partial
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
+import numpy as np
 import pandas as pd
 from pytz import timezone
 
 from numpy import ndarray
 from pandas import DataFrame
 
-from vnpy.trader.setting import SETTINGS
 from vnpy.trader.constant import Exchange, Interval
 from vnpy.trader.object import BarData, TickData, HistoryRequest
-from vnpy.trader.utility import round_to
 from vnpy.trader.datafeed import BaseDatafeed
+from vnpy.trader.utility import round_to
 
-import akshare as ak
+from .adjust import ADJUST_HFQ, ADJUST_NONE, adjust_df
+from .bar_store import BarStore
+from .batch import BarBatch, TickBatch
+from .replay import init_recorder
+from .resample import INTERVAL_RESAMPLE_RULE, RESAMPLE_SOURCE, resample_bars
+from .setting import get_setting
+from .trade_calendar import TradeCalendar
+from .upstream import ak_call, init_http_pool
+from .utils import date_utils as du
+from .utils.compact import compact_df
+from .utils.log import cache_path, log
+from .utils.metrics import metrics, start_http_server
+from .utils.singleflight import SingleFlight
 
 INTERVAL_VT2RQ: Dict[Interval, str] = {
     Interval.DAILY: "daily",
@@ -25,11 +42,22 @@ INTERVAL_VT2RQ: Dict[Interval, str] = {
 INTERVAL_ADJUSTMENT_MAP: Dict[Interval, timedelta] = {
     Interval.MINUTE: timedelta(minutes=1),
     Interval.HOUR: timedelta(hours=1),
-    Interval.DAILY: timedelta(hours=-15)         # no need to adjust for daily bar
+    Interval.DAILY: timedelta(hours=-15),        # no need to adjust for daily bar
+    Interval.WEEKLY: timedelta(hours=-15),
 }
 
 CHINA_TZ = timezone("Asia/Shanghai")
 
+PRICE_DECIMALS = 6
+PRICE_TICK = 0.000001
+
+# 新浪接口使用的代码前缀
+ZH_A_SYMBOL_PREFIX: Dict[Exchange, str] = {
+    Exchange.SSE: "sh",
+    Exchange.SZSE: "sz",
+    Exchange.BSE: "bj",
+}
+
 
 def string_to_date(ds: str) -> datetime:
     return datetime.strptime(ds, "%Y-%m-%d")
@@ -41,6 +69,137 @@ def date_to_string(dd: datetime) -> str:
     return dd.strftime("%Y%m%d")
 
 
+def split_date_range(start: datetime, end: datetime, chunk: str,
+                     align_week: bool = False) -> List[Tuple[datetime, datetime]]:
+    """
+    将[start, end]按自然年或自然月切分
+    :param chunk: "year"或"month"
+    :param align_week: 分段边界前移到所在周的周一，同一周不会被切到两段中
+    """
+    ranges = []
+    current = start
+    # 未前移的自然年、月边界，用于计算下一个边界
+    period = start
+    while current <= end:
+        if chunk == "year":
+            boundary = period.replace(year=period.year + 1, month=1, day=1,
+                                      hour=0, minute=0, second=0, microsecond=0)
+        elif chunk == "month":
+            year, month = divmod(period.month, 12)
+            boundary = period.replace(year=period.year + year, month=month + 1, day=1,
+                                      hour=0, minute=0, second=0, microsecond=0)
+        else:
+            raise ValueError("unknown chunk %s" % chunk)
+        period = boundary
+
+        if align_week:
+            boundary -= timedelta(days=boundary.weekday())
+            # 起点与边界在同一周时并入下一段
+            if boundary <= current:
+                continue
+
+        ranges.append((current, min(end, boundary - timedelta(microseconds=1))))
+        current = boundary
+    return ranges
+
+
+def last_bar_date(df: Optional[DataFrame]) -> Optional[date]:
+    """K线中最后一根的日期，没有数据时返回None"""
+    if df is None or len(df) == 0:
+        return None
+    return pd.to_datetime(df["datetime"]).max().date()
+
+
+def slice_bar_df(df: DataFrame, start: date, end: date) -> DataFrame:
+    """截取交易日在[start, end]内的K线，返回副本"""
+    day = pd.to_datetime(df["datetime"]).dt.normalize()
+    return df[(day >= pd.Timestamp(start)) & (day <= pd.Timestamp(end))].reset_index(drop=True)
+
+
+def convert_df_datetime(column: pd.Series, adjustment: timedelta) -> pd.DatetimeIndex:
+    """整列解析时间，减去K线时间偏移后本地化为CHINA_TZ"""
+    dt_index = pd.DatetimeIndex(pd.to_datetime(column))
+    dt_index = dt_index - adjustment
+    return dt_index.tz_localize(CHINA_TZ)
+
+
+def round_prices(values: ndarray) -> ndarray:
+    """
+    逐个值与round_to(value, PRICE_TICK)结果一致
+    round_to按十进制字符串取整，与np.round的二进制取整在小数位超过PRICE_DECIMALS时可能不同。
+    已是PRICE_DECIMALS位小数的值round_to结果不变，其余值去重后逐个调用round_to。
+    """
+    values = values.astype(np.float64)
+    inexact = np.round(values, PRICE_DECIMALS) != values
+    if not inexact.any():
+        return values
+
+    unique, inverse = np.unique(values[inexact], return_inverse=True)
+    rounded = np.array([round_to(value, PRICE_TICK) for value in unique.tolist()], dtype=np.float64)
+    values[inexact] = rounded[inverse]
+    return values
+
+
+def convert_df_to_columns(df: DataFrame, adjustment: timedelta) -> Dict[str, ndarray or pd.DatetimeIndex]:
+    """
+    将K线DataFrame按列转换为数组
+    :param df: 包含datetime、open、high、low、close、volume、turnover列的DataFrame
+    :param adjustment: K线结束时点到开始时点的偏移
+    :return: 字段名到数组的映射，datetime为带时区的DatetimeIndex
+    """
+    columns = {"datetime": convert_df_datetime(df["datetime"], adjustment)}
+
+    for name in ["open", "high", "low", "close"]:
+        columns[name] = round_prices(df[name].to_numpy(dtype=np.float64))
+
+    for name in ["volume", "turnover", "open_interest"]:
+        if name in df.columns:
+            columns[name] = df[name].to_numpy(dtype=np.float64)
+        else:
+            columns[name] = np.zeros(len(df), dtype=np.float64)
+
+    return columns
+
+
+TICK_COLUMNS: Dict[str, str] = {
+    '成交时间': "time",
+    '成交价格': "last_price",
+    '价格变动': "change",
+    '成交量': "last_volume",
+    '成交额': "last_turnover",
+    '性质': "direction",
+}
+
+
+def normalize_tick_df(df: DataFrame) -> DataFrame:
+    """
+    统一逐笔成交的列名并按列计算Tick字段
+    :param df: stock_zh_a_tick_163格式的数据，需带有date列（交易日）
+    :return: 包含datetime、last_price、last_volume、volume、turnover、open_price、high_price、low_price列，
+             其中volume、turnover为当日累计值，high_price、low_price为当日截至该笔的最高、最低价
+    """
+    df = df.rename(columns=TICK_COLUMNS)
+    if "datetime" in df.columns:
+        df["datetime"] = pd.to_datetime(df["datetime"])
+    else:
+        df["datetime"] = pd.to_datetime(df["date"]) + pd.to_timedelta(df["time"].astype(str))
+    df = df.sort_values("datetime", kind="stable").reset_index(drop=True)
+
+    for name in ["last_price", "last_volume", "last_turnover"]:
+        if name in df.columns:
+            df[name] = pd.to_numeric(df[name], errors="coerce").fillna(0).astype(np.float64)
+        else:
+            df[name] = 0.0
+
+    group = df.groupby(df["datetime"].dt.normalize(), sort=False)
+    df["volume"] = group["last_volume"].cumsum()
+    df["turnover"] = group["last_turnover"].cumsum()
+    df["open_price"] = group["last_price"].transform("first")
+    df["high_price"] = group["last_price"].cummax()
+    df["low_price"] = group["last_price"].cummin()
+    return df
+
+
 @dataclasses.dataclass
 class TradeDate:
     start:datetime
@@ -54,13 +213,6 @@ class Country(Enum):
     UK = "uk"
 
 
-country_trade_date: Dict[Country, TradeDate or None] = {
-    Country.China: None,
-    Country.US: None,
-    Country.UK: None,
-}
-
-
 EXCHANGE_COUNTRY = {
     Country.China: {
         Exchange.CFFEX,
@@ -88,35 +240,156 @@ def get_country(exchange: Exchange):
 
 
 def get_zh_a_trader_date():
-    date_list = list(ak.stock_zh_index_daily_tx("sh000919").date)
+    date_list = list(ak_call("stock_zh_index_daily_tx", "sh000919").date)
     date_list = [string_to_date(d) for d in date_list]
     start = date_list[0]
     end = date_list[-1]
     return TradeDate(start, end, date_list)
 
 
+country_trade_calendar: Dict[Country, TradeCalendar] = {
+    Country.China: TradeCalendar("china", lambda: get_zh_a_trader_date().date_list),
+}
+
+
 def get_trade_date(exchange, start: datetime, end: datetime)-> List[datetime]:
     country = get_country(exchange)
-    td = country_trade_date[country]
-    if td is None:
-        if country == Country.China:
-            td = get_zh_a_trader_date()
-        country_trade_date[country] = td
+    calendar = country_trade_calendar.get(country)
+    if calendar is None:
+        return []
+
+    return calendar.range(start, end)
+
+
+def is_trading_day(day: date) -> bool:
+    """
+    周一至周五且不是法定节假日
+    交易日历只包含已经过去的交易日，判断当天或未来的日期时使用，节假日数据未覆盖的年份只判断周末
+    """
+    if day.weekday() > 4:
+        return False
+    try:
+        return du.is_trade_date(day)
+    except NotImplementedError:
+        return True
+
+
+def last_closed_date() -> date:
+    """
+    数据已经完整的最后一天，datafeed.akshare.close_time（默认16:00）之后当天视为已收盘
+    只有已收盘日期的数据会写入本地缓存
+    """
+    now = datetime.now()
+    close_time = datetime.strptime(get_setting("close_time", "16:00"), "%H:%M").time()
+    if now.time() >= close_time:
+        return now.date()
+    return now.date() - timedelta(1)
+
 
-    return [d for d in td.date_list if end >= d >= start]
+# diskcache.Cache，第一次使用时才导入diskcache
+disk_caches: Dict[str, "Cache"] = {}
+disk_cache_lock = threading.Lock()
+
+
+def get_disk_cache(name: str) -> Optional["Cache"]:
+    """
+    按名称获取本地diskcache
+    可通过datafeed.akshare.<name>_cache关闭，datafeed.akshare.<name>_cache_path修改路径
+    """
+    if not get_setting(name + "_cache", True):
+        return None
+
+    with disk_cache_lock:
+        cache = disk_caches.get(name)
+        if cache is None:
+            from diskcache import Cache
+            cache = disk_caches[name] = Cache(get_setting(name + "_cache_path", cache_path(name)))
+    return cache
 
 
 class BaseFeed:
-    def query_bar_history(self, req: HistoryRequest) -> pd.DataFrame:
+    # 数据源原生支持的K线周期
+    intervals: Set[Interval] = set()
 
+    def query_bar_history(self, req: HistoryRequest, compact: bool = False) -> pd.DataFrame:
+        """
+        :param compact: 为True时压缩列类型，见compact_df
+        """
         pass
 
+    def fetch_bar_history(self, req: HistoryRequest) -> pd.DataFrame:
+        """下载未复权K线，本地存储只保存这部分数据"""
+        return self.query_bar_history(req)
+
+    def adjust_bars(self, req: HistoryRequest, df: pd.DataFrame) -> pd.DataFrame:
+        """对fetch_bar_history返回的K线复权，默认不处理"""
+        return df
+
     def query_tick_history(self, req: HistoryRequest) -> pd.DataFrame:
         pass
 
+    def fetch_tick_day(self, symbol: str, day: datetime) -> pd.DataFrame:
+        return ak_call("stock_zh_a_tick_163", symbol, date_to_string(day))
+
+    def query_tick_day(self, req: HistoryRequest, day: datetime) -> pd.DataFrame:
+        """查询单日Tick数据，已收盘的交易日结果会缓存到本地"""
+        cache = get_disk_cache("tick")
+        cached = day.date() <= last_closed_date() and cache is not None
+        key = "tick_%s_%s_%s" % (req.exchange.value, req.symbol, date_to_string(day))
+
+        if cached:
+            df = cache.get(key)
+            if df is not None:
+                metrics.inc("cache_hits_total", cache="tick")
+                if "date" not in df.columns:
+                    df.insert(0, "date", pd.Timestamp(day.date()))
+                return df
+            metrics.inc("cache_misses_total", cache="tick")
+
+        df = self.fetch_tick_day(req.symbol, day)
+        if df is not None and "date" not in df.columns:
+            # 逐笔数据只有成交时间，补充交易日用于拼接多日数据
+            df.insert(0, "date", pd.Timestamp(day.date()))
+        if cached and df is not None and len(df) > 0:
+            cache.set(key, df)
+        return df
+
+    def query_tick_by_day(self, req: HistoryRequest, workers: int = None) -> pd.DataFrame:
+        """
+        按交易日并发下载Tick数据，结果按日期顺序拼接
+        :param workers: 并发数，默认读取datafeed.akshare.tick_workers，为1时顺序下载
+        """
+        start: datetime = req.start
+        end: datetime = req.end
+
+        if end is None:
+            end = datetime.now()
+        if workers is None:
+            workers = get_setting("tick_workers", 8)
+
+        date_list = get_trade_date(req.exchange, start, end)
+        if workers <= 1 or len(date_list) <= 1:
+            ret = [self.query_tick_day(req, d) for d in date_list]
+        else:
+            with ThreadPoolExecutor(max_workers=min(workers, len(date_list))) as executor:
+                ret = list(executor.map(partial(self.query_tick_day, req), date_list))
+
+        ret = [df for df in ret if df is not None]
+        if not ret:
+            return pd.DataFrame()
+        return pd.concat(ret)
+
 
 class ZhADataFeed(BaseFeed):
-    def query_bar_history(self, req: HistoryRequest) -> pd.DataFrame:
+    intervals = {Interval.MINUTE, Interval.DAILY, Interval.WEEKLY}
+
+    def __init__(self, adjust: str = ADJUST_HFQ):
+        """
+        :param adjust: 复权方式，"qfq"、"hfq"或""，由未复权K线和本地保存的复权因子计算
+        """
+        self.adjust: str = adjust
+
+    def fetch_bar_history(self, req: HistoryRequest) -> pd.DataFrame:
         symbol: str = req.symbol
         interval: Interval = req.interval
         start: datetime = req.start
@@ -125,75 +398,249 @@ class ZhADataFeed(BaseFeed):
         if interval is None:
             interval = Interval.DAILY
 
-        period = INTERVAL_VT2RQ[interval]
-        df = ak.stock_zh_a_hist(symbol, period, date_to_string(start), date_to_string(end), "hfq")
-
-        df.rename(columns={
-            '日期': "datetime",
-            '开盘': 'open',
-            '收盘': 'close',
-            '最高': 'high',
-            '最低': 'low',
-            '成交量': 'volume',
-            '成交额': 'turnover',
-        }, inplace=True)
+        if interval == Interval.MINUTE:
+            if end is None:
+                end = datetime.now()
+            df = ak_call(
+                "stock_zh_a_hist_min_em", symbol, start.strftime("%Y-%m-%d 00:00:00"), end.strftime("%Y-%m-%d 23:59:59"), "1", ADJUST_NONE)
+        else:
+            period = INTERVAL_VT2RQ[interval]
+            df = ak_call("stock_zh_a_hist", symbol, period, date_to_string(start), date_to_string(end), ADJUST_NONE)
+
+        with metrics.timer("stage_seconds", op="bar", stage="rename"):
+            df.rename(columns={
+                '日期': "datetime",
+                '时间': "datetime",
+                '开盘': 'open',
+                '收盘': 'close',
+                '最高': 'high',
+                '最低': 'low',
+                '成交量': 'volume',
+                '成交额': 'turnover',
+            }, inplace=True)
         return df
 
+    def query_bar_history(self, req: HistoryRequest, compact: bool = False) -> pd.DataFrame:
+        df = self.adjust_bars(req, self.fetch_bar_history(req))
+
+        if compact:
+            return compact_df(df)
+        return df
+
+    def fetch_factor(self, exchange: Exchange, symbol: str) -> DataFrame:
+        """下载累计后复权因子，返回按日期升序的date和factor两列"""
+        df = ak_call("stock_zh_a_daily", ZH_A_SYMBOL_PREFIX[exchange] + symbol, adjust="hfq-factor")
+        return pd.DataFrame({
+            "date": pd.to_datetime(df["date"]),
+            "factor": df["hfq_factor"].astype(float),
+        }).sort_values("date", ignore_index=True)
+
+    def query_factor(self, exchange: Exchange, symbol: str) -> DataFrame:
+        """
+        查询复权因子，因子缓存在本地，超过datafeed.akshare.factor_refresh_days天后重新下载，
+        新的除权除息只需要刷新因子，不需要重新下载K线
+        """
+        cache = get_disk_cache("factor")
+        key = "factor_%s_%s" % (exchange.value, symbol)
+        if cache is not None:
+            value = cache.get(key)
+            if value is not None:
+                fetch_time, df = value
+                if datetime.now() - fetch_time < timedelta(days=get_setting("factor_refresh_days", 1)):
+                    metrics.inc("cache_hits_total", cache="factor")
+                    return df
+            metrics.inc("cache_misses_total", cache="factor")
+
+        df, _ = factor_flights.do(key, partial(self.fetch_factor, exchange, symbol))
+        if cache is not None:
+            cache.set(key, (datetime.now(), df))
+        return df
+
+    def adjust_bars(self, req: HistoryRequest, df: pd.DataFrame) -> pd.DataFrame:
+        if not self.adjust or df is None or len(df) == 0:
+            return df
+
+        factor_df = self.query_factor(req.exchange, req.symbol)
+        with metrics.timer("stage_seconds", op="bar", stage="adjust"):
+            return adjust_df(df, factor_df, self.adjust)
+
     def query_tick_history(self, req: HistoryRequest) -> pd.DataFrame:
-        symbol: str = req.symbol
-        start: datetime = req.start
-        end: datetime = req.end
+        return self.query_tick_by_day(req)
 
-        if end is None:
-            end = datetime.now()
 
-        date_list = get_trade_date(req.exchange, start, end)
-        ret = []
-        for d in date_list:
-            ret.append(ak.stock_zh_a_tick_163(symbol, date_to_string(d)))
+class FutureCrossSection:
+    """
+    期货日线截面缓存
 
-        return pd.concat(ret)
+    get_futures_daily一次返回交易所全部合约，这里按交易所和交易日缓存整个截面，
+    并以大写合约代码为索引，同一交易所同一日期的截面并发查询时只下载一次。
+    内存中每个交易所最多保留datafeed.akshare.future_cross_section_days个最近使用的截面，
+    更早的截面从本地缓存读取。
+    """
+
+    def __init__(self):
+        self.days: Dict[Exchange, "OrderedDict[datetime, DataFrame]"] = {}
+        self.locks: Dict[Exchange, threading.Lock] = {}
+        self.lock = threading.Lock()
+        self.flights = SingleFlight()
+        self.max_days: int = get_setting("future_cross_section_days", 250)
+
+    def _exchange_lock(self, exchange: Exchange) -> threading.Lock:
+        with self.lock:
+            lock = self.locks.get(exchange)
+            if lock is None:
+                lock = self.locks[exchange] = threading.Lock()
+                self.days[exchange] = OrderedDict()
+            return lock
+
+    def _remember(self, exchange: Exchange, day: datetime, df: DataFrame):
+        """放入内存缓存，超出max_days时淘汰最久未使用的截面"""
+        with self._exchange_lock(exchange):
+            days = self.days[exchange]
+            days[day] = df
+            days.move_to_end(day)
+            while len(days) > self.max_days:
+                days.popitem(last=False)
+
+    def _fetch(self, exchange: Exchange, start: datetime, end: datetime) -> Dict[datetime, DataFrame]:
+        df = ak_call("get_futures_daily", date_to_string(start), date_to_string(end), exchange.value)
+        ret = {}
+        if df is None or len(df) == 0:
+            return ret
+
+        df.index = df["symbol"].str.upper()
+        for day, group in df.groupby(pd.to_datetime(df["date"])):
+            ret[day.to_pydatetime()] = group
+        return ret
+
+    def _fetch_run(self, exchange: Exchange, run: List[datetime]) -> Dict[datetime, DataFrame]:
+        """下载连续交易日run的截面并写入缓存"""
+        cache = get_disk_cache("future")
+        fetched = self._fetch(exchange, run[0], run[-1])
+        for d, df in fetched.items():
+            # 上游尚未发布的截面为空，不缓存，下次查询时重新下载
+            if len(df) == 0:
+                continue
+            self._remember(exchange, d, df)
+
+            # 未收盘的截面可能不完整，不写入本地缓存
+            if cache is not None and d.date() <= last_closed_date():
+                cache.set("future_%s_%s" % (exchange.value, date_to_string(d)), df)
+        return fetched
+
+    def get_days(self, exchange: Exchange, date_list: List[datetime]) -> List[DataFrame]:
+        """返回date_list中每个交易日的截面，缺失的连续交易日合并为一次下载"""
+        lock = self._exchange_lock(exchange)
+        cache = get_disk_cache("future")
+
+        found: Dict[datetime, DataFrame] = {}
+        with lock:
+            days = self.days[exchange]
+            for d in date_list:
+                df = days.get(d)
+                if df is not None:
+                    days.move_to_end(d)
+                    found[d] = df
+
+        # 读取本地缓存和下载时不持有锁，其他交易日的查询不必等待
+        missing = []
+        for d in date_list:
+            if d in found:
+                continue
+
+            key = "future_%s_%s" % (exchange.value, date_to_string(d))
+            df = cache.get(key) if cache is not None else None
+            if df is not None:
+                found[d] = df
+                self._remember(exchange, d, df)
+            else:
+                missing.append(d)
+
+        # 交易日列表中相邻的缺失日期合并为一段
+        runs: List[List[datetime]] = []
+        positions = {d: i for i, d in enumerate(date_list)}
+        for d in missing:
+            if runs and positions[d] == positions[runs[-1][-1]] + 1:
+                runs[-1].append(d)
+            else:
+                runs.append([d])
+
+        for run in runs:
+            # 并发查询中包含本段的下载只执行一次，结果共享
+            fetched, _ = self.flights.do(exchange, partial(self._fetch_run, exchange, run), run[0], run[-1])
+            for d in run:
+                df = fetched.get(d)
+                if df is not None and len(df) > 0:
+                    found[d] = df
+
+        return [found.get(d, DataFrame()) for d in date_list]
+
+    def query(self, exchange: Exchange, symbol: str, start: datetime, end: datetime) -> DataFrame:
+        """查询单个合约在[start, end]内的日线"""
+        symbol = symbol.upper()
+        date_list = get_trade_date(exchange, start, end)
+
+        frames = [df.loc[[symbol]] for df in self.get_days(exchange, date_list) if symbol in df.index]
+        if not frames:
+            return DataFrame()
+        return pd.concat(frames).reset_index(drop=True)
+
+
+future_cross_section = FutureCrossSection()
 
 
 class ZhFutureDataFeed(BaseFeed):
-    def query_bar_history(self, req: HistoryRequest) -> pd.DataFrame:
+    intervals = {Interval.DAILY}
+
+    def query_bar_history(self, req: HistoryRequest, compact: bool = False) -> pd.DataFrame:
         symbol: str = req.symbol
 
         start: datetime = req.start
         end: datetime = req.end
         exchange = req.exchange
 
-        df = ak.get_futures_daily(date_to_string(start), date_to_string(end), exchange.value)
+        if end is None:
+            end = datetime.now()
+
+        df = future_cross_section.query(exchange, symbol, start, end)
+
+        df.rename(columns={"date": "datetime"}, inplace=True)
 
+        if compact:
+            return compact_df(df)
         return df
 
     def query_tick_history(self, req: HistoryRequest) -> pd.DataFrame:
-        symbol: str = req.symbol
-        start: datetime = req.start
-        end: datetime = req.end
+        return self.query_tick_by_day(req)
 
-        if end is None:
-            end = datetime.now()
 
-        date_list = get_trade_date(req.exchange, start, end)
-        ret = []
-        for d in date_list:
-            ret.append(ak.stock_zh_a_tick_163(symbol, date_to_string(d)))
+zh_a_feed = ZhADataFeed(get_setting("adjust", ADJUST_HFQ))
+zh_future_feed = ZhFutureDataFeed()
 
-        return pd.concat(ret)
+# 数据源实例长期复用
+FEEDS: Dict[Exchange, BaseFeed] = {
+    Exchange.CFFEX: zh_future_feed,
+    Exchange.SHFE: zh_future_feed,
+    Exchange.CZCE: zh_future_feed,
+    Exchange.DCE: zh_future_feed,
+    Exchange.INE: zh_future_feed,
 
+    Exchange.SSE: zh_a_feed,
+    Exchange.SZSE: zh_a_feed,
+    Exchange.BSE: zh_a_feed,
+}
 
-FEEDS = {
-    Exchange.CFFEX: ZhFutureDataFeed,
-    Exchange.SHFE: ZhFutureDataFeed,
-    Exchange.CZCE: ZhFutureDataFeed,
-    Exchange.DCE: ZhFutureDataFeed,
-    Exchange.INE: ZhFutureDataFeed,
 
-    Exchange.SSE: ZhADataFeed,
-    Exchange.SZSE: ZhADataFeed,
-    Exchange.BSE: ZhADataFeed,
-}
+bar_flights = SingleFlight()
+factor_flights = SingleFlight()
+
+
+@dataclasses.dataclass
+class BatchResult:
+    """批量查询中单个代码的结果，data和error只有一个有值"""
+    req: HistoryRequest
+    data: Optional[List[BarData]] = None
+    error: Optional[Exception] = None
 
 
 class AKShareDataFeed(BaseDatafeed):
@@ -202,7 +649,20 @@ class AKShareDataFeed(BaseDatafeed):
     def __init__(self):
         self.inited = False
 
+        # 本地存储只保存未复权K线，复权价格查询时由复权因子计算
+        self.store: Optional[BarStore] = None
+        if get_setting("bar_store", True):
+            self.store = BarStore(os.path.join(get_setting("bar_store_path", cache_path("bars")), "raw"))
+
     def init(self) -> bool:
+        init_http_pool()
+        init_recorder()
+
+        # 配置datafeed.akshare.metrics_port后以Prometheus文本格式提供/metrics
+        port: int = get_setting("metrics_port", 0)
+        if port:
+            start_http_server(port, get_setting("metrics_addr", "127.0.0.1"))
+
         self.inited = True
         return True
 
@@ -216,38 +676,330 @@ class AKShareDataFeed(BaseDatafeed):
         adjustment: timedelta = INTERVAL_ADJUSTMENT_MAP[interval]
 
         if df is not None:
+            metrics.count_frame(df, op="bar")
+
             # 填充NaN为0
-            df.fillna(0, inplace=True)
-
-            for row in df.itertuples():
-                dt: datetime = string_to_date(row.datetime)
-                dt: datetime = dt - adjustment
-                dt: datetime = CHINA_TZ.localize(dt)
-
-                bar: BarData = BarData(
-                    symbol=req.symbol,
-                    exchange=req.exchange,
-                    interval=interval,
-                    datetime=dt,
-                    open_price=round_to(row.open, 0.000001),
-                    high_price=round_to(row.high, 0.000001),
-                    low_price=round_to(row.low, 0.000001),
-                    close_price=round_to(row.close, 0.000001),
-                    volume=row.volume,
-                    turnover=row.turnover,
-                    open_interest=getattr(row, "open_interest", 0),
-                    gateway_name="AK"
-                )
-
-                data.append(bar)
+            with metrics.timer("stage_seconds", op="bar", stage="fillna"):
+                df.fillna(0, inplace=True)
+
+            # 整列完成时间解析、偏移、时区和价格精度处理，最后一次性构建BarData
+            with metrics.timer("stage_seconds", op="bar", stage="convert"):
+                columns: Dict[str, ndarray] = convert_df_to_columns(df, adjustment)
+
+            with metrics.timer("stage_seconds", op="bar", stage="build"):
+                data = [
+                    BarData(
+                        symbol=req.symbol,
+                        exchange=req.exchange,
+                        interval=interval,
+                        datetime=dt,
+                        open_price=open_price,
+                        high_price=high_price,
+                        low_price=low_price,
+                        close_price=close_price,
+                        volume=volume,
+                        turnover=turnover,
+                        open_interest=open_interest,
+                        gateway_name="AK"
+                    )
+                    for dt, open_price, high_price, low_price, close_price, volume, turnover, open_interest in zip(
+                        columns["datetime"].to_pydatetime(),
+                        columns["open"].tolist(),
+                        columns["high"].tolist(),
+                        columns["low"].tolist(),
+                        columns["close"].tolist(),
+                        columns["volume"].tolist(),
+                        columns["turnover"].tolist(),
+                        columns["open_interest"].tolist(),
+                    )
+                ]
 
         return data
 
-    def convert_df_to_tick(self, df: DataFrame) -> Optional[List[TickData]]:
-        return df
+    def convert_df_to_batch(self, req: HistoryRequest, df: DataFrame) -> Optional[BarBatch]:
+        """将K线DataFrame转换为按列存储的BarBatch，不创建BarData对象"""
+        if df is None:
+            return None
+
+        interval: Interval = req.interval if req.interval is not None else Interval.DAILY
+        adjustment: timedelta = INTERVAL_ADJUSTMENT_MAP[interval]
+
+        df.fillna(0, inplace=True)
+        columns: Dict[str, ndarray] = convert_df_to_columns(df, adjustment)
+
+        return BarBatch(
+            req.symbol,
+            req.exchange,
+            interval,
+            CHINA_TZ,
+            columns["datetime"].tz_convert(None).to_numpy(),
+            "AK",
+            open_price=columns["open"],
+            high_price=columns["high"],
+            low_price=columns["low"],
+            close_price=columns["close"],
+            volume=columns["volume"],
+            turnover=columns["turnover"],
+            open_interest=columns["open_interest"],
+        )
+
+    def convert_df_to_tick(self, req: HistoryRequest, df: DataFrame) -> Optional[List[TickData]]:
+        data: List[TickData] = []
+
+        if df is not None and len(df) > 0:
+            metrics.count_frame(df, op="tick")
+
+            # 整列完成字段统一、时间合成和时区处理，最后一次性构建TickData
+            with metrics.timer("stage_seconds", op="tick", stage="normalize"):
+                df = normalize_tick_df(df)
+            with metrics.timer("stage_seconds", op="tick", stage="convert"):
+                dt_index = convert_df_datetime(df["datetime"], timedelta(0))
+
+            with metrics.timer("stage_seconds", op="tick", stage="build"):
+                data = [
+                    TickData(
+                        symbol=req.symbol,
+                        exchange=req.exchange,
+                        datetime=dt,
+                        last_price=last_price,
+                        last_volume=last_volume,
+                        volume=volume,
+                        turnover=turnover,
+                        open_price=open_price,
+                        high_price=high_price,
+                        low_price=low_price,
+                        gateway_name="AK"
+                    )
+                    for dt, last_price, last_volume, volume, turnover, open_price, high_price, low_price in zip(
+                        dt_index.to_pydatetime(),
+                        df["last_price"].tolist(),
+                        df["last_volume"].tolist(),
+                        df["volume"].tolist(),
+                        df["turnover"].tolist(),
+                        df["open_price"].tolist(),
+                        df["high_price"].tolist(),
+                        df["low_price"].tolist(),
+                    )
+                ]
+
+        return data
+
+    def convert_df_to_tick_batch(self, req: HistoryRequest, df: DataFrame) -> Optional[TickBatch]:
+        """将逐笔成交DataFrame转换为按列存储的TickBatch，不创建TickData对象"""
+        if df is None:
+            return None
+
+        if len(df) == 0:
+            return TickBatch(req.symbol, req.exchange, CHINA_TZ, np.array([], dtype="datetime64[ns]"), "AK")
+
+        df = normalize_tick_df(df)
+        dt_index = convert_df_datetime(df["datetime"], timedelta(0))
+
+        return TickBatch(
+            req.symbol,
+            req.exchange,
+            CHINA_TZ,
+            dt_index.tz_convert(None).to_numpy(),
+            "AK",
+            **{name: df[name].to_numpy(dtype=np.float64) for name in TickBatch.FIELDS}
+        )
+
+    def query_bar_df(self, req: HistoryRequest, feed: BaseFeed = None, compact: bool = False) -> Optional[DataFrame]:
+        """
+        查询K线数据，返回未转换的DataFrame
+        :param compact: 为True时压缩列类型，见compact_df
+        """
+        if not self.inited:
+            n: bool = self.init()
+            if not n:
+                return None
+
+        exchange: Exchange = req.exchange
+        if exchange not in FEEDS:
+            return None
+
+        if feed is None:
+            feed = FEEDS[exchange]
+
+        # 相同或被包含的并发请求只下载一次，按日期区间合并
+        interval: Interval = req.interval if req.interval is not None else Interval.DAILY
+        key = (type(feed).__name__, req.symbol, exchange, interval, getattr(feed, "adjust", None))
+        start: date = req.start.date()
+        end: date = (req.end or datetime.now()).date()
+
+        df, shared = bar_flights.do(key, partial(self._query_bar_df, feed, req), start, end)
+        if df is None:
+            return None
+        if shared:
+            df = slice_bar_df(df, start, end)
+
+        if compact:
+            return compact_df(df)
+        return df if shared else df.copy()
+
+    def _query_bar_df(self, feed: BaseFeed, req: HistoryRequest) -> Optional[DataFrame]:
+        # 能由更细周期合成的K线在本地合成，不再单独下载
+        interval: Interval = req.interval if req.interval is not None else Interval.DAILY
+        source: Interval = RESAMPLE_SOURCE.get(interval)
+        if source is not None and source in feed.intervals:
+            # 周线从周一开始取数，保证第一根K线完整
+            start: datetime = req.start
+            if interval == Interval.WEEKLY:
+                start = start - timedelta(days=start.weekday())
+
+            source_req = HistoryRequest(
+                symbol=req.symbol,
+                exchange=req.exchange,
+                start=start,
+                end=req.end,
+                interval=source
+            )
+            df = self.query_feed_bar_df(feed, source_req)
+            return resample_bars(df, INTERVAL_RESAMPLE_RULE[interval], req.exchange)
+
+        # 数据源不提供的周期不下载，也不写入本地存储
+        if interval not in feed.intervals:
+            log.warn("%s does not support %s bars" % (type(feed).__name__, interval.value))
+            return None
+
+        return self.query_feed_bar_df(feed, req)
+
+    def query_feed_bar_df(self, feed: BaseFeed, req: HistoryRequest) -> Optional[DataFrame]:
+        if self.store is None:
+            return feed.query_bar_history(req)
+        return self.query_bar_df_from_store(feed, req)
+
+    def query_bar_df_from_store(self, feed: BaseFeed, req: HistoryRequest) -> Optional[DataFrame]:
+        """先补齐本地存储中缺失的日期区间，再从本地存储读取并复权"""
+        interval: Interval = req.interval if req.interval is not None else Interval.DAILY
+        start: date = req.start.date()
+        end: date = (req.end or datetime.now()).date()
+
+        # 未收盘的数据可能不完整，不标记为已下载
+        closed_date: date = last_closed_date()
+        covered_end: date = min(end, closed_date)
+
+        missing = self.store.missing_ranges(req.exchange, req.symbol, interval, start, end)
+        metrics.inc("cache_misses_total" if missing else "cache_hits_total", cache="bar_store")
+
+        for missing_start, missing_end in missing:
+            sub_req = HistoryRequest(
+                symbol=req.symbol,
+                exchange=req.exchange,
+                start=datetime.combine(missing_start, datetime.min.time()),
+                end=datetime.combine(missing_end, datetime.min.time()),
+                interval=req.interval
+            )
+            df = feed.fetch_bar_history(sub_req)
+
+            # 无法按时间分区的数据不进入本地存储
+            if df is not None and len(df) > 0 and "datetime" not in df.columns:
+                return feed.query_bar_history(req)
+
+            # 收盘后上游可能还没有发布当天数据，没有当天数据时不标记当天为已下载
+            save_end: date = min(missing_end, covered_end)
+            if save_end == closed_date and is_trading_day(closed_date) and last_bar_date(df) != closed_date:
+                save_end = closed_date - timedelta(1)
+
+            with metrics.timer("stage_seconds", op="bar", stage="store_save"):
+                self.store.save(req.exchange, req.symbol, interval, df, missing_start, save_end)
+
+        with metrics.timer("stage_seconds", op="bar", stage="store_load"):
+            df = self.store.load(req.exchange, req.symbol, interval, start, end)
+        return feed.adjust_bars(req, df)
 
     def query_bar_history(self, req: HistoryRequest) -> Optional[List[BarData]]:
         """查询K线数据"""
+        with metrics.timer("request_seconds", op="bar", symbol=req.vt_symbol):
+            with metrics.timer("stage_seconds", op="bar", stage="query"):
+                df = self.query_bar_df(req)
+            if df is None:
+                return []
+
+            return self.convert_df_to_bar(req, df)
+
+    def query_bar_history_columnar(self, req: HistoryRequest) -> Optional[BarBatch]:
+        """查询K线数据，返回按列存储的BarBatch"""
+        df = self.query_bar_df(req)
+        if df is None:
+            return None
+
+        return self.convert_df_to_batch(req, df)
+
+    def iter_bar_history(self, req: HistoryRequest, chunk: str = "year", prefetch: int = 1) -> Iterator[List[BarData]]:
+        """
+        按时间分段查询K线数据，逐段返回
+        :param chunk: 分段方式，"year"或"month"
+        :param prefetch: 后台预先下载的段数，内存中最多同时保留prefetch + 1段数据
+        :return: 每段的K线列表，按时间顺序
+        """
+        # 周线按周切分，避免跨段的一周分别生成不完整和完整的两根K线
+        ranges = split_date_range(req.start, req.end or datetime.now(), chunk,
+                                  align_week=req.interval == Interval.WEEKLY)
+
+        def query(start: datetime, end: datetime) -> List[BarData]:
+            sub_req = HistoryRequest(
+                symbol=req.symbol,
+                exchange=req.exchange,
+                start=start,
+                end=end,
+                interval=req.interval
+            )
+            return self.query_bar_history(sub_req)
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        futures = deque()
+        try:
+            for start, end in ranges:
+                futures.append(executor.submit(query, start, end))
+                if len(futures) > prefetch:
+                    yield futures.popleft().result()
+
+            while futures:
+                yield futures.popleft().result()
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def query_bar_history_batch(self, reqs: List[HistoryRequest], workers: int = None) -> Dict[str, BatchResult]:
+        """
+        并发查询多个代码的K线数据
+        :param reqs: 查询请求，按FEEDS中的数据源实例分组
+        :param workers: 最大并发数，默认读取datafeed.akshare.batch_workers
+        :return: vt_symbol到BatchResult的映射，单个代码出错不影响其他代码
+        """
+        if workers is None:
+            workers = get_setting("batch_workers", 16)
+
+        results: Dict[str, BatchResult] = {}
+        groups: Dict[BaseFeed, List[HistoryRequest]] = {}
+        for req in reqs:
+            feed = FEEDS.get(req.exchange)
+            if feed is None:
+                results[req.vt_symbol] = BatchResult(req, error=ValueError("unsupported exchange %s" % req.exchange))
+                continue
+            groups.setdefault(feed, []).append(req)
+
+        def query(feed: BaseFeed, req: HistoryRequest) -> BatchResult:
+            try:
+                df = self.query_bar_df(req, feed)
+                return BatchResult(req, data=self.convert_df_to_bar(req, df) if df is not None else [])
+            except Exception as ex:
+                return BatchResult(req, error=ex)
+
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            futures = []
+            for feed, group in groups.items():
+                futures.extend(executor.submit(query, feed, req) for req in group)
+
+            for future in futures:
+                result: BatchResult = future.result()
+                results[result.req.vt_symbol] = result
+
+        return results
+
+    def query_tick_history(self, req: HistoryRequest) -> Optional[List[TickData]]:
         if not self.inited:
             n: bool = self.init()
             if not n:
@@ -257,20 +1009,26 @@ class AKShareDataFeed(BaseDatafeed):
         if exchange not in FEEDS:
             return []
 
-        clazz = FEEDS[exchange]
-        df = clazz().query_bar_history(req)
+        feed = FEEDS[exchange]
+        with metrics.timer("request_seconds", op="tick", symbol=req.vt_symbol):
+            with metrics.timer("stage_seconds", op="tick", stage="query"):
+                df = feed.query_tick_history(req)
+            return self.convert_df_to_tick(req, df)
 
-        return self.convert_df_to_bar(req, df)
+    def query_tick_history_columnar(self, req: HistoryRequest) -> Optional[TickBatch]:
+        """查询Tick数据，返回按列存储的TickBatch"""
+        if not self.inited:
+            n: bool = self.init()
+            if not n:
+                return None
 
-    def query_tick_history(self, req: HistoryRequest) -> Optional[List[TickData]]:
         exchange: Exchange = req.exchange
         if exchange not in FEEDS:
-            return []
-
-        clazz = FEEDS[exchange]
+            return None
 
-        df = clazz().query_tick_history(req)
-        return self.convert_df_to_tick(df)
+        feed = FEEDS[exchange]
+        df = feed.query_tick_history(req)
+        return self.convert_df_to_tick_batch(req, df)
 
 
 # def to_rq_symbol(symbol: str, exchange: Exchange) -> str:
@@ -0,0 +1,96 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, List, Optional
+
+from vnpy.trader.object import BarData, TickData, HistoryRequest
+
+from .akshre_feed import AKShareDataFeed
+from .batch import BarBatch, TickBatch
+from .setting import get_setting
+
+# ThreadPoolExecutor.shutdown的cancel_futures参数从Python 3.9开始支持
+SUPPORT_CANCEL_FUTURES = "cancel_futures" in ThreadPoolExecutor.shutdown.__code__.co_varnames
+
+
+class AsyncAKShareDataFeed:
+    """
+    基于asyncio的AKData数据服务接口
+
+    阻塞的查询在独立的线程池中执行，并发数由信号量限制，线程数不会随未完成的请求增长。
+    可以直接用asyncio.gather并发提交大量请求，请求被取消或超时后立即释放并发名额，
+    尚未开始执行的下载会一并取消。
+    """
+
+    def __init__(self, feed: AKShareDataFeed = None, max_workers: int = None,
+                 concurrency: int = None, timeout: float = None):
+        """
+        :param feed: 实际执行查询的同步接口
+        :param max_workers: 线程池大小，默认读取datafeed.akshare.async_workers
+        :param concurrency: 同时执行的请求数，默认与线程池大小相同
+        :param timeout: 单个请求的默认超时秒数，默认读取datafeed.akshare.async_timeout，None表示不超时
+        """
+        self.feed: AKShareDataFeed = feed if feed is not None else AKShareDataFeed()
+        self.max_workers: int = max_workers or get_setting("async_workers", 16)
+        self.concurrency: int = concurrency or self.max_workers
+        self.timeout: Optional[float] = timeout if timeout is not None else get_setting("async_timeout", None)
+
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="AKShareAsync")
+        return self.executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # 信号量与事件循环绑定，换了事件循环需要重新创建，只在协程中调用
+        loop = asyncio.get_running_loop()
+        if self.semaphore is None or self.loop is not loop:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+            self.loop = loop
+        return self.semaphore
+
+    async def _run(self, func: Callable, *args, timeout: float = None):
+        if timeout is None:
+            timeout = self.timeout
+
+        loop = asyncio.get_running_loop()
+        async with self._get_semaphore():
+            future = loop.run_in_executor(self._get_executor(), partial(func, *args))
+            return await asyncio.wait_for(future, timeout)
+
+    async def init(self) -> bool:
+        return await self._run(self.feed.init)
+
+    async def query_bar_history(self, req: HistoryRequest, timeout: float = None) -> Optional[List[BarData]]:
+        """查询K线数据"""
+        return await self._run(self.feed.query_bar_history, req, timeout=timeout)
+
+    async def query_bar_history_columnar(self, req: HistoryRequest, timeout: float = None) -> Optional[BarBatch]:
+        """查询K线数据，返回按列存储的BarBatch"""
+        return await self._run(self.feed.query_bar_history_columnar, req, timeout=timeout)
+
+    async def query_tick_history(self, req: HistoryRequest, timeout: float = None) -> Optional[List[TickData]]:
+        """查询Tick数据"""
+        return await self._run(self.feed.query_tick_history, req, timeout=timeout)
+
+    async def query_tick_history_columnar(self, req: HistoryRequest, timeout: float = None) -> Optional[TickBatch]:
+        """查询Tick数据，返回按列存储的TickBatch"""
+        return await self._run(self.feed.query_tick_history_columnar, req, timeout=timeout)
+
+    def close(self, wait: bool = True):
+        """关闭线程池，尚未开始的请求会被取消"""
+        if self.executor is not None:
+            if SUPPORT_CANCEL_FUTURES:
+                self.executor.shutdown(wait=wait, cancel_futures=True)
+            else:
+                self.executor.shutdown(wait=wait)
+            self.executor = None
+
+    async def __aenter__(self) -> "AsyncAKShareDataFeed":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close(wait=False)
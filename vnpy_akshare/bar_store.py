@@ -0,0 +1,144 @@
+import json
+import os
+import threading
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from pandas import DataFrame
+
+from vnpy.trader.constant import Exchange, Interval
+
+DateRange = Tuple[date, date]
+
+
+def merge_ranges(ranges: List[DateRange]) -> List[DateRange]:
+    """合并重叠或相邻的日期区间"""
+    ret: List[DateRange] = []
+    for start, end in sorted(ranges):
+        if ret and start <= ret[-1][1] + timedelta(1):
+            if end > ret[-1][1]:
+                ret[-1] = (ret[-1][0], end)
+        else:
+            ret.append((start, end))
+    return ret
+
+
+def subtract_ranges(start: date, end: date, covered: List[DateRange]) -> List[DateRange]:
+    """计算[start, end]中未被covered覆盖的区间，covered需已合并排序"""
+    ret: List[DateRange] = []
+    current = start
+    for c_start, c_end in covered:
+        if c_end < current:
+            continue
+        if c_start > end:
+            break
+        if c_start > current:
+            ret.append((current, c_start - timedelta(1)))
+        current = max(current, c_end + timedelta(1))
+        if current > end:
+            break
+    if current <= end:
+        ret.append((current, end))
+    return ret
+
+
+class BarStore:
+    """
+    本地K线存储
+
+    按 交易所/代码/周期/年份 分区保存为Parquet文件，每个分区目录下的
+    coverage.json记录已经下载过的日期区间，用于计算需要补齐的缺口。
+    """
+
+    COVERAGE_FILE = "coverage.json"
+
+    def __init__(self, root: str):
+        self.root: str = root
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.RLock] = {}
+
+    def _partition_dir(self, exchange: Exchange, symbol: str, interval: Interval) -> str:
+        return os.path.join(self.root, exchange.value, symbol, interval.value)
+
+    def _key_lock(self, path: str) -> threading.RLock:
+        with self._lock:
+            lock = self._key_locks.get(path)
+            if lock is None:
+                lock = self._key_locks[path] = threading.RLock()
+            return lock
+
+    def get_coverage(self, exchange: Exchange, symbol: str, interval: Interval) -> List[DateRange]:
+        path = os.path.join(self._partition_dir(exchange, symbol, interval), self.COVERAGE_FILE)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r") as f:
+            ranges = json.load(f)
+        return [(date.fromisoformat(s), date.fromisoformat(e)) for s, e in ranges]
+
+    def _put_coverage(self, exchange: Exchange, symbol: str, interval: Interval, ranges: List[DateRange]):
+        path = os.path.join(self._partition_dir(exchange, symbol, interval), self.COVERAGE_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump([[s.isoformat(), e.isoformat()] for s, e in ranges], f)
+        os.replace(tmp, path)
+
+    def missing_ranges(self, exchange: Exchange, symbol: str, interval: Interval,
+                       start: date, end: date) -> List[DateRange]:
+        """返回[start, end]中尚未下载的日期区间"""
+        return subtract_ranges(start, end, self.get_coverage(exchange, symbol, interval))
+
+    def load(self, exchange: Exchange, symbol: str, interval: Interval,
+             start: date, end: date) -> Optional[DataFrame]:
+        """读取[start, end]内的K线，按datetime排序"""
+        path = self._partition_dir(exchange, symbol, interval)
+        frames = []
+        with self._key_lock(path):
+            for year in range(start.year, end.year + 1):
+                file = os.path.join(path, "%d.parquet" % year)
+                if os.path.exists(file):
+                    frames.append(pd.read_parquet(file))
+
+        if not frames:
+            return None
+
+        df = pd.concat(frames, ignore_index=True)
+        day = df["datetime"].dt.normalize()
+        df = df[(day >= pd.Timestamp(start)) & (day <= pd.Timestamp(end))]
+        return df.reset_index(drop=True)
+
+    def save(self, exchange: Exchange, symbol: str, interval: Interval, df: Optional[DataFrame],
+             start: date = None, end: date = None):
+        """
+        写入K线并把[start, end]标记为已下载
+        :param df: 包含datetime列的K线，同一时间的旧数据会被覆盖
+        """
+        path = self._partition_dir(exchange, symbol, interval)
+        with self._key_lock(path):
+            os.makedirs(path, exist_ok=True)
+
+            if df is not None and len(df) > 0:
+                df = df.copy()
+                df["datetime"] = pd.to_datetime(df["datetime"])
+                for year, group in df.groupby(df["datetime"].dt.year):
+                    file = os.path.join(path, "%d.parquet" % year)
+                    if os.path.exists(file):
+                        group = pd.concat([pd.read_parquet(file), group], ignore_index=True)
+                        group = group.drop_duplicates("datetime", keep="last")
+                    group = group.sort_values("datetime").reset_index(drop=True)
+
+                    tmp = file + ".tmp"
+                    group.to_parquet(tmp, index=False)
+                    os.replace(tmp, file)
+
+            if start is not None and end is not None and start <= end:
+                ranges = self.get_coverage(exchange, symbol, interval)
+                ranges.append((start, end))
+                self._put_coverage(exchange, symbol, interval, merge_ranges(ranges))
+
+    def clear(self, exchange: Exchange, symbol: str, interval: Interval):
+        path = self._partition_dir(exchange, symbol, interval)
+        with self._key_lock(path):
+            if os.path.exists(path):
+                for name in os.listdir(path):
+                    os.remove(os.path.join(path, name))
@@ -0,0 +1,160 @@
+import copy
+from collections.abc import Sequence
+from datetime import tzinfo
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from numpy import ndarray
+
+from vnpy.trader.constant import Exchange, Interval
+from vnpy.trader.object import BarData, TickData
+
+
+class DataBatch(Sequence):
+    """
+    按列存储的行情数据
+
+    每个字段一个连续的NumPy数组，只有按下标访问时才创建vnpy数据对象，
+    因此可以直接替代List[BarData]/List[TickData]交给现有的vnpy组件使用。
+    """
+
+    FIELDS: List[str] = []
+
+    def __init__(self, symbol: str, exchange: Exchange, tz: tzinfo, datetime: ndarray,
+                 gateway_name: str = "AK", **fields: ndarray):
+        """
+        :param datetime: UTC时间的datetime64[ns]数组
+        :param tz: 生成数据对象时使用的时区
+        :param fields: FIELDS中各字段对应的float64数组，缺失字段填0
+        """
+        self.symbol: str = symbol
+        self.exchange: Exchange = exchange
+        self.tz: tzinfo = tz
+        self.gateway_name: str = gateway_name
+
+        self.datetime: ndarray = np.ascontiguousarray(datetime, dtype="datetime64[ns]")
+        for name in self.FIELDS:
+            value = fields.get(name)
+            if value is None:
+                value = np.zeros(len(self.datetime), dtype=np.float64)
+            setattr(self, name, np.ascontiguousarray(value, dtype=np.float64))
+
+    @property
+    def vt_symbol(self) -> str:
+        return f"{self.symbol}.{self.exchange.value}"
+
+    @property
+    def datetime_index(self) -> pd.DatetimeIndex:
+        """带时区的时间索引"""
+        return pd.DatetimeIndex(self.datetime).tz_localize("UTC").tz_convert(self.tz)
+
+    @property
+    def nbytes(self) -> int:
+        return self.datetime.nbytes + sum(getattr(self, name).nbytes for name in self.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.datetime)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._take(index)
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("%s index out of range" % type(self).__name__)
+
+        dt = pd.Timestamp(self.datetime[index], tz="UTC").tz_convert(self.tz).to_pydatetime()
+        return self._make(index, dt)
+
+    def _make(self, index: int, dt):
+        raise NotImplementedError
+
+    def _take(self, index) -> "DataBatch":
+        """切片返回共享底层数组的视图"""
+        batch = copy.copy(self)
+        batch.datetime = self.datetime[index]
+        for name in self.FIELDS:
+            setattr(batch, name, getattr(self, name)[index])
+        return batch
+
+    def to_dict(self) -> Dict[str, ndarray]:
+        ret = {"datetime": self.datetime}
+        ret.update({name: getattr(self, name) for name in self.FIELDS})
+        return ret
+
+    def to_dataframe(self) -> pd.DataFrame:
+        df = pd.DataFrame({name: getattr(self, name) for name in self.FIELDS})
+        df.insert(0, "datetime", self.datetime_index)
+        return df
+
+    def __repr__(self) -> str:
+        return "%s(%s, %d rows)" % (type(self).__name__, self.vt_symbol, len(self))
+
+
+class BarBatch(DataBatch):
+    """按列存储的K线数据"""
+
+    FIELDS = [
+        "open_price",
+        "high_price",
+        "low_price",
+        "close_price",
+        "volume",
+        "turnover",
+        "open_interest",
+    ]
+
+    def __init__(self, symbol: str, exchange: Exchange, interval: Interval, tz: tzinfo,
+                 datetime: ndarray, gateway_name: str = "AK", **fields: ndarray):
+        super().__init__(symbol, exchange, tz, datetime, gateway_name, **fields)
+        self.interval: Interval = interval
+
+    def _make(self, index: int, dt) -> BarData:
+        return BarData(
+            symbol=self.symbol,
+            exchange=self.exchange,
+            interval=self.interval,
+            datetime=dt,
+            open_price=float(self.open_price[index]),
+            high_price=float(self.high_price[index]),
+            low_price=float(self.low_price[index]),
+            close_price=float(self.close_price[index]),
+            volume=float(self.volume[index]),
+            turnover=float(self.turnover[index]),
+            open_interest=float(self.open_interest[index]),
+            gateway_name=self.gateway_name
+        )
+
+    def __repr__(self) -> str:
+        return "BarBatch(%s, %s, %d bars)" % (self.vt_symbol, self.interval, len(self))
+
+
+class TickBatch(DataBatch):
+    """按列存储的逐笔成交数据"""
+
+    FIELDS = [
+        "last_price",
+        "last_volume",
+        "volume",
+        "turnover",
+        "open_price",
+        "high_price",
+        "low_price",
+    ]
+
+    def _make(self, index: int, dt) -> TickData:
+        return TickData(
+            symbol=self.symbol,
+            exchange=self.exchange,
+            datetime=dt,
+            last_price=float(self.last_price[index]),
+            last_volume=float(self.last_volume[index]),
+            volume=float(self.volume[index]),
+            turnover=float(self.turnover[index]),
+            open_price=float(self.open_price[index]),
+            high_price=float(self.high_price[index]),
+            low_price=float(self.low_price[index]),
+            gateway_name=self.gateway_name
+        )
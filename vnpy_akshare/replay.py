@@ -0,0 +1,176 @@
+import datetime
+import gzip
+import hashlib
+import os
+import pickle
+import random
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from .setting import get_setting
+from .utils.log import data_path
+
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+MODE_AUTO = "auto"
+
+# 生成键时参与排序的标量类型
+SCALAR_TYPES = (str, bytes, int, float, bool, type(None), datetime.date)
+
+
+class ReplayMissError(KeyError):
+    """回放模式下找不到对应的录制数据"""
+    pass
+
+
+class ReplayError(ConnectionError):
+    """回放时按error_rate注入的模拟错误"""
+    pass
+
+
+def normalize(value: Any) -> Any:
+    """
+    生成键之前规范化参数值，使其repr与元素顺序无关
+    证券列表常由list(set(...))生成，顺序随字符串哈希种子变化，因此只包含标量的list/tuple及所有set按repr排序
+    """
+    if isinstance(value, dict):
+        return sorted(((k, normalize(v)) for k, v in value.items()), key=lambda item: str(item[0]))
+    if isinstance(value, (set, frozenset)):
+        return sorted((normalize(v) for v in value), key=repr)
+    if isinstance(value, (list, tuple)):
+        items = [normalize(v) for v in value]
+        if all(isinstance(v, SCALAR_TYPES) for v in value):
+            items.sort(key=repr)
+        return type(value)(items) if type(value) in (list, tuple) else items
+    return value
+
+
+class Recorder:
+    """
+    上游接口录制/回放
+
+    安装后upstream.call的每次调用都经过这里：
+    record模式调用真实接口并把结果以gzip压缩的pickle保存在path下，
+    replay模式只读取录制数据，auto模式有录制数据时回放、没有时录制。
+    回放时可以加入模拟延迟和错误，用于离线测试和性能评估。
+    """
+
+    def __init__(self, path: str, mode: str = MODE_REPLAY, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, seed: int = None):
+        """
+        :param path: 录制数据目录
+        :param latency: 回放时每次调用的固定延迟，秒
+        :param jitter: 回放时在latency基础上增加的随机延迟上限，秒
+        :param error_rate: 回放时抛出ReplayError的概率
+        """
+        self.path: str = path
+        self.mode: str = mode
+        self.latency: float = latency
+        self.jitter: float = jitter
+        self.error_rate: float = error_rate
+
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+        self.hits: int = 0
+        self.records: int = 0
+
+    @staticmethod
+    def make_key(endpoint: str, func: Callable, args: tuple, kwargs: dict) -> str:
+        """根据接口名和参数生成录制数据的文件名"""
+        # 位置参数和闭包变量本身的顺序有意义，只规范化每个值
+        parts = [endpoint, repr(tuple(normalize(v) for v in args)), repr(normalize(kwargs))]
+
+        # 闭包没有显式参数，把捕获的变量也作为键的一部分
+        closure = getattr(func, "__closure__", None)
+        if closure:
+            parts.append(repr([normalize(cell.cell_contents) for cell in closure]))
+
+        return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+    def fixture_path(self, endpoint: str, key: str) -> str:
+        return os.path.join(self.path, endpoint, key + ".pkl.gz")
+
+    def _load(self, path: str) -> Any:
+        with gzip.open(path, "rb") as f:
+            return pickle.load(f)
+
+    def _save(self, path: str, value: Any):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = "%s.%d.tmp" % (path, threading.get_ident())
+        with gzip.open(tmp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def _replay(self, path: str) -> Any:
+        with self.lock:
+            delay = self.latency + self.random.random() * self.jitter
+            fail = self.random.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            raise ReplayError("injected upstream error")
+
+        value = self._load(path)
+        with self.lock:
+            self.hits += 1
+        return value
+
+    def call(self, endpoint: str, func: Callable, *args, **kwargs) -> Any:
+        path = self.fixture_path(endpoint, self.make_key(endpoint, func, args, kwargs))
+
+        if self.mode != MODE_RECORD and os.path.exists(path):
+            return self._replay(path)
+
+        if self.mode == MODE_REPLAY:
+            raise ReplayMissError("no fixture for %s%s" % (endpoint, args))
+
+        value = func(*args, **kwargs)
+        self._save(path, value)
+        with self.lock:
+            self.records += 1
+        return value
+
+    def __enter__(self) -> "Recorder":
+        install(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        uninstall()
+
+
+recorder: Optional[Recorder] = None
+
+
+def install(r: Recorder):
+    global recorder
+    recorder = r
+
+
+def uninstall():
+    global recorder
+    recorder = None
+
+
+def get_recorder() -> Optional[Recorder]:
+    return recorder
+
+
+def init_recorder() -> Optional[Recorder]:
+    """
+    按配置安装录制/回放，datafeed.akshare.replay_mode为record、replay或auto时生效，
+    其余参数为replay_path、replay_latency、replay_jitter、replay_error_rate
+    """
+    mode = get_setting("replay_mode", "")
+    if not mode or recorder is not None:
+        return recorder
+
+    install(Recorder(
+        get_setting("replay_path", data_path("replay")),
+        mode,
+        latency=get_setting("replay_latency", 0.0),
+        jitter=get_setting("replay_jitter", 0.0),
+        error_rate=get_setting("replay_error_rate", 0.0),
+    ))
+    return recorder
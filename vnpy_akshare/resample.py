@@ -0,0 +1,88 @@
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from vnpy.trader.constant import Exchange, Interval
+
+BAR_AGGREGATION: Dict[str, str] = {
+    "open": "first",
+    "high": "max",
+    "low": "min",
+    "close": "last",
+    "volume": "sum",
+    "turnover": "sum",
+    "open_interest": "last",
+}
+
+# A股小时线按交易时段切分，数值为各小时K线结束时点距0点的分钟数：
+# 09:30-10:30、10:30-11:30、13:00-14:00、14:00-15:00
+ZH_A_HOUR_ENDS = np.array([10 * 60 + 30, 11 * 60 + 30, 14 * 60, 15 * 60])
+
+ZH_A_EXCHANGES = {Exchange.SSE, Exchange.SZSE, Exchange.BSE}
+
+# 可以由更细周期合成的K线周期
+RESAMPLE_SOURCE: Dict[Interval, Interval] = {
+    Interval.WEEKLY: Interval.DAILY,
+    Interval.HOUR: Interval.MINUTE,
+}
+
+
+def _aggregate(df: DataFrame, keys, datetime: str) -> DataFrame:
+    """
+    按keys分组聚合
+    :param datetime: "last"使用组内最后一根K线的时间，"key"使用分组键作为时间
+    """
+    agg = {k: v for k, v in BAR_AGGREGATION.items() if k in df.columns}
+    if datetime == "last":
+        agg["datetime"] = "last"
+
+    ret = df.groupby(keys, sort=True).agg(agg)
+    if datetime == "key":
+        ret.index.name = "datetime"
+        ret = ret.reset_index()
+    else:
+        ret = ret.reset_index(drop=True)
+    return ret[["datetime"] + [k for k in BAR_AGGREGATION if k in ret.columns]]
+
+
+def resample_bars(df: Optional[DataFrame], rule: str, exchange: Exchange = None) -> Optional[DataFrame]:
+    """
+    将细周期K线合成为粗周期K线，datetime为K线结束时点
+    :param df: 包含datetime、open、high、low、close、volume、turnover列的K线
+    :param rule: "W" 日线合成周线，"M" 日线合成月线，"H" 分钟线合成小时线
+    :param exchange: 合成小时线时A股按交易时段切分，其他交易所按整点切分
+    :return: 合成后的K线，周线和月线的datetime为周期内最后一个交易日
+    """
+    if df is None or len(df) == 0:
+        return df
+
+    df = df.copy()
+    df["datetime"] = pd.to_datetime(df["datetime"])
+    df = df.sort_values("datetime", kind="stable")
+    dt = df["datetime"]
+
+    if rule == "W":
+        # 以周一为分组键
+        keys = (dt - pd.to_timedelta(dt.dt.weekday, unit="D")).dt.normalize()
+        return _aggregate(df, keys, "last")
+    elif rule == "M":
+        keys = dt.dt.to_period("M")
+        return _aggregate(df, keys, "last")
+    elif rule == "H":
+        if exchange in ZH_A_EXCHANGES:
+            minutes = (dt.dt.hour * 60 + dt.dt.minute).to_numpy()
+            index = np.minimum(np.searchsorted(ZH_A_HOUR_ENDS, minutes, side="left"), len(ZH_A_HOUR_ENDS) - 1)
+            keys = dt.dt.normalize() + pd.to_timedelta(ZH_A_HOUR_ENDS[index], unit="min")
+        else:
+            keys = dt.dt.ceil("h")
+        return _aggregate(df, keys.rename("datetime"), "key")
+
+    raise ValueError("unknown resample rule %s" % rule)
+
+
+INTERVAL_RESAMPLE_RULE: Dict[Interval, str] = {
+    Interval.WEEKLY: "W",
+    Interval.HOUR: "H",
+}
@@ -0,0 +1,15 @@
+from typing import Any, Optional
+
+SETTING_PREFIX = "datafeed.akshare."
+
+# vnpy.trader.setting会加载vt_setting.json并导入vnpy.trader.utility，第一次读取配置时再导入
+_settings: Optional[dict] = None
+
+
+def get_setting(name: str, default: Any = None) -> Any:
+    """读取vt_setting.json中以datafeed.akshare.开头的配置项"""
+    global _settings
+    if _settings is None:
+        from vnpy.trader.setting import SETTINGS
+        _settings = SETTINGS
+    return _settings.get(SETTING_PREFIX + name, default)
@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from .setting import get_setting
+from .utils.log import cache_path, log
+
+
+class TradeCalendar:
+    """
+    交易日历
+
+    交易日以排序后的列表保存，区间查询使用二分查找。日历保存在本地，进程启动时
+    直接读取本地文件，超过datafeed.akshare.calendar_refresh_days天后在后台刷新。
+    日历由指数历史行情生成，只包含已经过去的交易日。查询区间内有最后一个交易日之后、
+    今天之前的工作日时，日历可能缺少交易日，同样在后台刷新，本次查询仍使用已有的日历，
+    两次下载至少间隔datafeed.akshare.calendar_retry_minutes分钟。
+    """
+
+    def __init__(self, name: str, loader: Callable[[], List[datetime]]):
+        """
+        :param name: 本地文件名
+        :param loader: 从数据源下载完整交易日列表的函数
+        """
+        self.name: str = name
+        self.loader: Callable[[], List[datetime]] = loader
+
+        self.dates: Optional[List[datetime]] = None
+        # 上次下载的时间，读取本地文件时为文件修改时间，直接设置dates时为None
+        self.checked: Optional[float] = None
+        self.lock = threading.Lock()
+        self.refreshing: bool = False
+
+    @property
+    def path(self) -> str:
+        return os.path.join(get_setting("calendar_path", cache_path("calendar")), self.name + ".npy")
+
+    def _read(self) -> Optional[List[datetime]]:
+        path = self.path
+        if not os.path.exists(path):
+            return None
+        self.checked = os.path.getmtime(path)
+        return np.load(path).astype("datetime64[us]").tolist()
+
+    def _write(self, dates: List[datetime]):
+        path = self.path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp.npy"
+        np.save(tmp, np.array(dates, dtype="datetime64[D]"))
+        os.replace(tmp, path)
+
+    def _download(self) -> List[datetime]:
+        # 下载失败时同样记录，避免每次查询都重试
+        self.checked = time.time()
+        dates = sorted(set(self.loader()))
+        self._write(dates)
+        return dates
+
+    def _checked_before(self, seconds: float) -> bool:
+        return self.checked is not None and time.time() - self.checked > seconds
+
+    def _is_stale(self) -> bool:
+        return self._checked_before(get_setting("calendar_refresh_days", 7) * 24 * 60 * 60)
+
+    def _is_outdated(self, end: datetime) -> bool:
+        """最后一个交易日之后、end和今天之前有工作日，且距离上次下载已超过重试间隔"""
+        dates = self.dates
+        if not dates:
+            return False
+
+        day = dates[-1].date() + timedelta(1)
+        while day.weekday() >= 5:
+            day += timedelta(1)
+        end_day = end.date() if isinstance(end, datetime) else end
+        if day > end_day or day >= date.today():
+            return False
+        return self._checked_before(get_setting("calendar_retry_minutes", 60) * 60)
+
+    def _refresh_background(self):
+        def refresh():
+            try:
+                self.dates = self._download()
+            except Exception as ex:
+                log.warn("trade calendar %s refresh failed: %r" % (self.name, ex))
+            finally:
+                self.refreshing = False
+
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+        threading.Thread(target=refresh, name="TradeCalendarRefresh", daemon=True).start()
+
+    def load(self) -> List[datetime]:
+        """首次使用时加载日历，多线程下只加载一次，之后每次调用检查是否需要在后台刷新"""
+        if self.dates is None:
+            with self.lock:
+                if self.dates is None:
+                    dates = self._read()
+                    self.dates = dates if dates is not None else self._download()
+
+        if self._is_stale():
+            self._refresh_background()
+        return self.dates
+
+    def refresh(self) -> List[datetime]:
+        """立即从数据源重新下载日历"""
+        dates = self._download()
+        self.dates = dates
+        return dates
+
+    def range(self, start: datetime, end: datetime) -> List[datetime]:
+        """返回[start, end]内的交易日"""
+        dates = self.load()
+        if start.tzinfo is not None:
+            start = start.replace(tzinfo=None)
+        if end.tzinfo is not None:
+            end = end.replace(tzinfo=None)
+        if self._is_outdated(end):
+            self._refresh_background()
+        return dates[bisect_left(dates, start):bisect_right(dates, end)]
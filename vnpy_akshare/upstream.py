@@ -0,0 +1,119 @@
+import threading
+from functools import partial
+from typing import Any, Callable, Dict
+
+from pandas import DataFrame
+
+from . import replay
+from .setting import get_setting
+from .utils.metrics import metrics
+from .utils.rate_limit import AdaptiveLimiter
+
+limiters: Dict[str, AdaptiveLimiter] = {}
+limiters_lock = threading.Lock()
+
+# init_http_pool成功后为True，未启用时不导入requests
+http_pool_installed: bool = False
+
+LIMITER_DEFAULTS: Dict[str, Any] = {
+    "rate": 5.0,
+    "burst": 5,
+    "min_rate": 0.5,
+    "max_rate": 50.0,
+    "concurrency": 4,
+    "min_concurrency": 1,
+    "max_concurrency": 32,
+    "slow_seconds": 10.0,
+    "decrease": 0.5,
+}
+
+# 视为上游失败并触发限流器退避的异常，requests的异常均继承自OSError
+# 解析结果时的KeyError、ValueError等通常是调用方或数据格式的问题，不退避
+BACKOFF_ERRORS = (OSError,)
+
+
+def limiter_setting(endpoint: str, name: str) -> Any:
+    """按 rate_limit.<endpoint>.<name> > rate_limit.<name> > 默认值 的顺序读取限流配置"""
+    default = get_setting("rate_limit." + name, LIMITER_DEFAULTS[name])
+    return get_setting("rate_limit.%s.%s" % (endpoint, name), default)
+
+
+def get_limiter(endpoint: str) -> AdaptiveLimiter:
+    """每个上游接口一个限流器"""
+    limiter = limiters.get(endpoint)
+    if limiter is None:
+        with limiters_lock:
+            limiter = limiters.get(endpoint)
+            if limiter is None:
+                kwargs = {name: limiter_setting(endpoint, name) for name in LIMITER_DEFAULTS}
+                limiter = limiters[endpoint] = AdaptiveLimiter(endpoint, failure_types=BACKOFF_ERRORS, **kwargs)
+    return limiter
+
+
+def call_pooled(func: Callable, *args, **kwargs) -> Any:
+    """在连接池作用域内调用func，只有上游接口内部的请求复用连接"""
+    from .utils import http_pool
+
+    with http_pool.scope():
+        return func(*args, **kwargs)
+
+
+def call_timed(endpoint: str, func: Callable, *args, **kwargs) -> Any:
+    """记录func本身的耗时，不包含限流等待"""
+    with metrics.timer("upstream_seconds", endpoint=endpoint):
+        return func(*args, **kwargs)
+
+
+def call(endpoint: str, func: Callable, *args, **kwargs) -> Any:
+    """
+    调用上游数据接口，所有对外部数据源的访问都经过这里
+    :param endpoint: 接口名称，用于区分限流器
+    """
+    recorder = replay.get_recorder()
+    if recorder is not None:
+        func = partial(recorder.call, endpoint, func)
+    # 录制数据的键取自原始func的闭包，连接池作用域套在录制之外
+    if http_pool_installed:
+        func = partial(call_pooled, func)
+    func = partial(call_timed, endpoint, func)
+
+    try:
+        if not get_setting("rate_limit", True):
+            result = func(*args, **kwargs)
+        else:
+            result = get_limiter(endpoint).call(func, *args, **kwargs)
+    except Exception:
+        metrics.inc("upstream_errors_total", endpoint=endpoint)
+        raise
+
+    if isinstance(result, DataFrame):
+        metrics.count_frame(result, op="upstream", endpoint=endpoint)
+    return result
+
+
+def ak_call(name: str, *args, **kwargs) -> Any:
+    """调用akshare中名为name的函数，akshare导入耗时较长，第一次调用时才导入"""
+    import akshare as ak
+    return call(name, getattr(ak, name), *args, **kwargs)
+
+
+def init_http_pool() -> bool:
+    """
+    让akshare的HTTP请求复用长连接，只对经过call调用的上游接口生效，不影响进程内其他库
+    连接池大小由datafeed.akshare.http_pool_connections和datafeed.akshare.http_pool_maxsize配置
+    """
+    global http_pool_installed
+    if not get_setting("http_pool", True):
+        return False
+
+    from .utils import http_pool
+
+    with limiters_lock:
+        if http_pool.installed() is None:
+            pool = http_pool.SessionPool(
+                pool_connections=get_setting("http_pool_connections", 10),
+                pool_maxsize=get_setting("http_pool_maxsize", 32)
+            )
+            http_pool.install(pool)
+        http_pool_installed = True
+    return True
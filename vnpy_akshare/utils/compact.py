@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ("open", "high", "low", "close", "avg", "pre_close", "high_limit", "low_limit",
+                 "settle", "pre_settle")
+INTEGER_COLUMNS = ("volume", "open_interest")
+CATEGORY_COLUMNS = ("code", "symbol", "variety")
+DATE_COLUMNS = ("date", "datetime")
+
+INT32_MAX = np.iinfo(np.int32).max
+
+
+def _compact_price(values, decimals):
+    """
+    价格列转换为float32，转换后按decimals四舍五入必须与原值一致，否则返回None
+    原值本身精度超过decimals位时同样返回None，避免丢失精度
+    """
+    values = values.astype(np.float64)
+    rounded = np.round(values, decimals)
+    if not np.allclose(rounded, values, rtol=1e-12, atol=1e-12, equal_nan=True):
+        return None
+
+    compact = rounded.astype(np.float32)
+    if not np.array_equal(np.round(compact.astype(np.float64), decimals), rounded, equal_nan=True):
+        return None
+    return compact
+
+
+def _compact_integer(values):
+    """全部为整数的数量列转换为整数，能放入int32时使用int32"""
+    values = values.astype(np.float64)
+    if len(values) == 0 or not np.isfinite(values).all() or not (values == np.floor(values)).all():
+        return None
+    if np.abs(values).max() <= INT32_MAX:
+        return values.astype(np.int32)
+    return values.astype(np.int64)
+
+
+def compact_df(df, decimals=2):
+    """
+    压缩DataFrame的列类型以节省内存：价格为float32，成交量等为整数，代码为category，日期为datetime64
+    不满足无损条件的列保持原类型，df.attrs["price_decimals"]记录价格的校验精度
+    :param decimals: 价格的小数位数
+    :return: 新的DataFrame，不修改df
+    """
+    if df is None:
+        return None
+
+    df = df.copy()
+    for name in df.columns:
+        column = df[name]
+        if name in PRICE_COLUMNS and pd.api.types.is_numeric_dtype(column):
+            values = _compact_price(column.to_numpy(), decimals)
+        elif name in INTEGER_COLUMNS and pd.api.types.is_numeric_dtype(column):
+            values = _compact_integer(column.to_numpy())
+        elif name in CATEGORY_COLUMNS and not isinstance(column.dtype, pd.CategoricalDtype):
+            values = column.astype("category")
+        elif name in DATE_COLUMNS and (pd.api.types.is_object_dtype(column) or pd.api.types.is_string_dtype(column)):
+            values = pd.to_datetime(column)
+        else:
+            values = None
+
+        if values is not None:
+            df[name] = values
+
+    df.attrs["price_decimals"] = decimals
+    return df
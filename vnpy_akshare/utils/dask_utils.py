@@ -1,11 +1,9 @@
 import os
 
-import joblib
-from dask.distributed import Client
-
 from .log import info_path, log
 
-client: Client = None
+# dask.distributed.Client，init_client时才导入dask
+client = None
 
 
 def ping(host):
@@ -64,6 +62,9 @@ def get_dask_server():
 def init_client(upload=False):
     global client
     if client is None:
+        import joblib
+        from dask.distributed import Client
+
         server = get_dask_server()
         try:
             if server:
@@ -1,12 +1,12 @@
 import datetime as dt
-from collections import Iterable
+from collections.abc import Iterable
 
 import numpy as np
 from chinese_calendar import is_holiday
 
 
 def to_date(d: str or int or dt.datetime or dt.date):
-    if type(d) is str or type(d) is np.str:
+    if type(d) is str or type(d) is np.str_:
         return dt.datetime.strptime(d, "%Y-%m-%d")
 
     if isinstance(d, Iterable):
@@ -0,0 +1,83 @@
+import threading
+from contextlib import contextmanager
+
+import requests
+import requests.api
+from requests.adapters import HTTPAdapter
+
+
+class SessionPool:
+    """
+    共享连接池的requests会话
+
+    每个线程一个Session，所有Session挂载同一个HTTPAdapter，
+    因此TCP/TLS连接在线程之间复用并保持长连接。
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=32):
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.local = threading.local()
+
+    def session(self):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", self.adapter)
+            session.mount("https://", self.adapter)
+            self.local.session = session
+        return session
+
+    def request(self, method, url, **kwargs):
+        """与requests.request相同，但复用连接"""
+        session = self.session()
+        # requests.request每次使用新的Session，这里清空cookie保持一致
+        session.cookies.clear()
+        return session.request(method=method, url=url, **kwargs)
+
+    def close(self):
+        self.adapter.close()
+
+
+_installed = None
+_original_request = requests.api.request
+_scope = threading.local()
+
+
+@contextmanager
+def scope():
+    """with块内当前线程通过requests.get/post等发出的请求使用连接池"""
+    depth = getattr(_scope, "depth", 0)
+    _scope.depth = depth + 1
+    try:
+        yield
+    finally:
+        _scope.depth = depth
+
+
+def _request(method, url, **kwargs):
+    pool = _installed
+    if pool is not None and getattr(_scope, "depth", 0):
+        return pool.request(method, url, **kwargs)
+    return _original_request(method, url, **kwargs)
+
+
+def install(pool: SessionPool):
+    """
+    让scope()内的requests.get/post等模块级函数使用pool，akshare内部的请求因此复用连接
+    scope()之外的请求，如进程内其他库发出的请求，仍使用requests原来的实现
+    """
+    global _installed
+    _installed = pool
+    requests.api.request = _request
+
+
+def uninstall():
+    global _installed
+    requests.api.request = _original_request
+    if _installed is not None:
+        _installed.close()
+        _installed = None
+
+
+def installed():
+    return _installed
@@ -1,7 +1,6 @@
 import os
 import sys
-
-import logbook
+import threading
 
 
 def _path(path, *args):
@@ -45,6 +44,8 @@ def local_data_path(*args):
 
 
 def gen_log(name=""):
+    import logbook
+
     logname = data_path('TEST-' + name + '.log')
 
     # if os.path.exists(logname):
@@ -57,4 +58,23 @@ def gen_log(name=""):
     return logger
 
 
-log = gen_log("default")
+class LazyLog:
+    """第一次使用时才调用gen_log创建日志文件和Handler，导入模块时没有副作用"""
+
+    def __init__(self, name=""):
+        self._name = name
+        self._logger = None
+        self._lock = threading.Lock()
+
+    def _get_logger(self):
+        if self._logger is None:
+            with self._lock:
+                if self._logger is None:
+                    self._logger = gen_log(self._name)
+        return self._logger
+
+    def __getattr__(self, item):
+        return getattr(self._get_logger(), item)
+
+
+log = LazyLog("default")
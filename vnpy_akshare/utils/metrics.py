@@ -0,0 +1,179 @@
+import threading
+import time
+from contextlib import contextmanager
+
+PROMETHEUS_PREFIX = "vnpy_akshare_"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Metrics:
+    """
+    进程内指标：计数器和耗时汇总
+
+    计数器只增不减，汇总记录次数、总和与最大值。每次记录后依次调用hooks，
+    hook签名为hook(kind, name, value, labels)，kind为"counter"或"summary"，
+    可用于转发到其他监控系统。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.summaries = {}
+        self.hooks = []
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def _notify(self, kind, name, value, labels):
+        for hook in self.hooks:
+            try:
+                hook(kind, name, value, labels)
+            except Exception:
+                # 监控出错不影响数据查询
+                pass
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        if self.hooks:
+            self._notify("counter", name, value, labels)
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self.lock:
+            summary = self.summaries.get(key)
+            if summary is None:
+                self.summaries[key] = [1, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                summary[2] = max(summary[2], value)
+        if self.hooks:
+            self._notify("summary", name, value, labels)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """记录with块的耗时，单位为秒，块内抛出异常时同样记录"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def count_frame(self, df, **labels):
+        """记录DataFrame的行数和字节数，字节数不包含object列引用的对象"""
+        if df is None:
+            return
+        self.inc("rows_total", len(df), **labels)
+        self.inc("bytes_total", int(df.memory_usage(index=True).sum()), **labels)
+
+    def snapshot(self):
+        """返回当前指标的副本，{"counters": {(name, labels): value}, "summaries": {(name, labels): (count, sum, max)}}"""
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "summaries": {key: tuple(value) for key, value in self.summaries.items()},
+            }
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.summaries.clear()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (name, _escape(value)) for name, value in labels)
+
+
+def to_prometheus(m, prefix=PROMETHEUS_PREFIX):
+    """按Prometheus文本格式输出，汇总输出为_count、_sum和_max"""
+    snapshot = m.snapshot()
+    lines = []
+
+    counters = {}
+    for (name, labels), value in snapshot["counters"].items():
+        counters.setdefault(name, []).append((labels, value))
+    for name in sorted(counters):
+        lines.append("# TYPE %s%s counter" % (prefix, name))
+        for labels, value in sorted(counters[name]):
+            lines.append("%s%s%s %s" % (prefix, name, _format_labels(labels), value))
+
+    summaries = {}
+    for (name, labels), value in snapshot["summaries"].items():
+        summaries.setdefault(name, []).append((labels, value))
+    for name in sorted(summaries):
+        lines.append("# TYPE %s%s summary" % (prefix, name))
+        for labels, (count, total, maximum) in sorted(summaries[name]):
+            label_str = _format_labels(labels)
+            lines.append("%s%s_count%s %d" % (prefix, name, label_str, count))
+            lines.append("%s%s_sum%s %.9f" % (prefix, name, label_str, total))
+        lines.append("# TYPE %s%s_max gauge" % (prefix, name))
+        for labels, (count, total, maximum) in sorted(summaries[name]):
+            lines.append("%s%s_max%s %.9f" % (prefix, name, _format_labels(labels), maximum))
+
+    return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def _make_handler():
+    # http.server只在启动导出接口时导入
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+
+            body = to_prometheus(metrics).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_http_server(port, addr="127.0.0.1"):
+    """在后台线程启动/metrics接口，每个进程只启动一次"""
+    global _server
+    with _server_lock:
+        if _server is None:
+            from http.server import ThreadingHTTPServer
+            _server = ThreadingHTTPServer((addr, port), _make_handler())
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="MetricsExporter", daemon=True).start()
+    return _server
+
+
+def stop_http_server():
+    global _server
+    with _server_lock:
+        if _server is not None:
+            _server.shutdown()
+            _server.server_close()
+            _server = None
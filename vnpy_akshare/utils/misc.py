@@ -4,3 +4,19 @@ import json
 def file2dict(file_path):
     with open(file_path, 'r') as f:
         return json.load(f)
+
+
+class cached_classproperty:
+    """
+    延迟计算的类属性，第一次访问时调用func(cls)，结果直接替换为类属性
+    用于避免在类定义时打开文件、创建目录等
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.name = func.__name__
+
+    def __get__(self, obj, cls):
+        value = self.func(cls)
+        setattr(cls, self.name, value)
+        return value
@@ -0,0 +1,118 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """令牌桶，rate为每秒补充的令牌数，capacity为允许的突发量"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _fill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def acquire(self):
+        """取一个令牌，没有令牌时阻塞等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._fill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def set_rate(self, rate: float):
+        with self.lock:
+            self._fill(time.monotonic())
+            self.rate = rate
+
+
+class AdaptiveLimiter:
+    """
+    自适应限流器
+
+    令牌桶限制请求速率，并发上限按AIMD调整：请求成功且耗时低于slow_seconds时
+    并发上限和速率缓慢增加，失败或过慢时按decrease比例下降。
+    只有failure_types中的异常视为上游失败，其他异常不调整并发上限和速率。
+    """
+
+    def __init__(self, name, rate=5.0, burst=5, min_rate=0.5, max_rate=50.0,
+                 concurrency=4, min_concurrency=1, max_concurrency=32,
+                 slow_seconds=10.0, decrease=0.5, failure_types=(Exception,)):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.limit = float(concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.slow_seconds = slow_seconds
+        self.decrease = decrease
+        self.failure_types = failure_types
+
+        self.active = 0
+        self.success_count = 0
+        self.failure_count = 0
+        self.last_decrease = 0.0
+        self.cond = threading.Condition()
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    def acquire(self):
+        """等待并发名额和令牌，返回开始时间"""
+        with self.cond:
+            while self.active >= int(self.limit):
+                self.cond.wait()
+            self.active += 1
+        self.bucket.acquire()
+        return time.monotonic()
+
+    def release(self, start, success):
+        """
+        请求结束后调整并发上限和速率
+        :param success: None表示请求因与上游无关的原因失败，只归还并发名额
+        """
+        elapsed = time.monotonic() - start
+        with self.cond:
+            self.active -= 1
+            if success is None:
+                pass
+            elif success and elapsed < self.slow_seconds:
+                self.success_count += 1
+                # 加性增加：每个并发窗口内的请求都成功时并发上限加1
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+                self.bucket.set_rate(min(self.max_rate, self.bucket.rate + 1 / self.limit))
+            else:
+                self.failure_count += 1
+                # 同一批并发请求的失败只降一次，上次下调之前发出的请求不再重复下调
+                if start >= self.last_decrease:
+                    self.last_decrease = time.monotonic()
+                    self.limit = max(self.min_concurrency, self.limit * self.decrease)
+                    self.bucket.set_rate(max(self.min_rate, self.bucket.rate * self.decrease))
+            self.cond.notify_all()
+
+    def call(self, func, *args, **kwargs):
+        start = self.acquire()
+        success = None
+        try:
+            ret = func(*args, **kwargs)
+            success = True
+            return ret
+        except self.failure_types:
+            success = False
+            raise
+        finally:
+            self.release(start, success)
+
+    def __repr__(self):
+        return "AdaptiveLimiter(%s, rate=%.2f/s, concurrency=%.2f, active=%d)" % (
+            self.name, self.bucket.rate, self.limit, self.active)
@@ -0,0 +1,127 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .metrics import metrics
+
+
+def _to_datetime64(value):
+    return np.datetime64(pd.Timestamp(value), "ns")
+
+
+class _Entry:
+    def __init__(self, start, end, universe, df, date_column):
+        self.start = _to_datetime64(start)
+        self.end = _to_datetime64(end)
+        self.universe = universe
+        self.df = df
+        # 截取子区间时按日期比较，插入时统一转换一次
+        self.dates = pd.to_datetime(df[date_column]).to_numpy(dtype="datetime64[ns]")
+        self.nbytes = int(df.memory_usage(index=True, deep=True).sum()) + self.dates.nbytes
+
+    def contains(self, start, end, universe):
+        if not (self.start <= start and end <= self.end):
+            return False
+        return universe is None or (self.universe is not None and universe <= self.universe)
+
+
+class ResultCache:
+    """
+    进程内的查询结果缓存，按总字节数限制大小，超出时淘汰最久未使用的结果
+
+    key为请求的规范描述，不包含日期区间。同一个key下已缓存的区间包含请求区间、
+    且证券范围包含请求的证券范围时，从缓存的结果中按日期截取返回。
+    返回的DataFrame可能与缓存共享数据，调用方不应原地修改。
+    """
+
+    def __init__(self, max_bytes, date_column="date", name="result"):
+        """
+        :param max_bytes: 缓存的最大字节数，按DataFrame的内存占用计算，0表示不缓存
+        :param date_column: 截取区间时使用的日期列
+        :param name: 命中率指标的cache标签
+        """
+        self.max_bytes = max_bytes
+        self.date_column = date_column
+        self.name = name
+
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, start, end, universe=None):
+        """
+        查找包含[start, end]的结果
+        :param universe: 请求的证券代码frozenset，None表示不检查
+        :return: DataFrame，未命中时返回None
+        """
+        start = _to_datetime64(start)
+        end = _to_datetime64(end)
+        with self.lock:
+            for entry_key, entry in reversed(self.entries.items()):
+                if entry_key[0] == key and entry.contains(start, end, universe):
+                    self.entries.move_to_end(entry_key)
+                    self.hits += 1
+                    break
+            else:
+                entry = None
+                self.misses += 1
+
+        if entry is None:
+            metrics.inc("cache_misses_total", cache=self.name)
+            return None
+        metrics.inc("cache_hits_total", cache=self.name)
+
+        if entry.start == start and entry.end == end:
+            return entry.df
+        mask = (entry.dates >= start) & (entry.dates <= end)
+        return entry.df[mask].reset_index(drop=True)
+
+    def put(self, key, start, end, df, universe=None):
+        if df is None or self.max_bytes <= 0:
+            return
+
+        entry = _Entry(start, end, universe, df, self.date_column)
+        if entry.nbytes > self.max_bytes:
+            return
+
+        with self.lock:
+            # 新结果包含的旧结果不再需要
+            for entry_key, old in list(self.entries.items()):
+                if entry_key[0] == key and entry.contains(old.start, old.end, old.universe):
+                    self._remove(entry_key)
+
+            entry_key = (key, entry.start, entry.end)
+            if entry_key in self.entries:
+                self._remove(entry_key)
+            self.entries[entry_key] = entry
+            self.nbytes += entry.nbytes
+
+            while self.nbytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _remove(self, entry_key):
+        entry = self.entries.pop(entry_key)
+        self.nbytes -= entry.nbytes
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """返回{"hits", "misses", "evictions", "entries", "bytes", "max_bytes"}"""
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,69 @@
+import threading
+
+
+class _Call:
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+    def contains(self, start, end):
+        if self.start == start and self.end == end:
+            return True
+        if start is None or end is None or self.start is None or self.end is None:
+            return False
+        return self.start <= start and end <= self.end
+
+
+class SingleFlight:
+    """
+    合并进程内相同的并发请求
+
+    同一个key下，如果已有一个正在执行的请求且其区间[start, end]包含当前请求的区间，
+    当前请求直接等待该请求完成并共享结果，而不是重复执行。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, func, start=None, end=None):
+        """
+        执行func，返回(结果, 是否为共享的结果)
+        共享的结果覆盖的区间可能大于[start, end]，需要调用方自行截取
+        """
+        with self.lock:
+            for call in self.calls.get(key, []):
+                if call.contains(start, end):
+                    break
+            else:
+                call = None
+
+            if call is None:
+                call = _Call(start, end)
+                self.calls.setdefault(key, []).append(call)
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+            return call.result, False
+        except Exception as ex:
+            call.error = ex
+            raise
+        finally:
+            with self.lock:
+                calls = self.calls[key]
+                calls.remove(call)
+                if not calls:
+                    del self.calls[key]
+            call.event.set()
@@ -3,15 +3,13 @@ from functools import partial
 from queue import Empty, Queue
 from threading import Semaphore, current_thread
 
-import dask
-import joblib
 import numpy as np
 import pandas as pd
-from joblib import Parallel
 
-from .dask_utils import init_client
 from .log import log
 
+# dask和joblib导入耗时较长，在实际并行执行时才导入
+
 DEFAULT_BACKEND = 'dask'
 
 
@@ -28,7 +26,13 @@ def main_task(func, tasks, result: list, lock: Semaphore, count, backend):
 
 
 def parallel_execute(tasks, backend, count=None, batch_size: str or int = "auto"):
+    import joblib
+    from joblib import Parallel
+
     if backend == "dask":
+        import dask
+        from .dask_utils import init_client
+
         init_client()
         return dask.compute(*tasks(backend))
         # with joblib.parallel_backend(backend):
@@ -68,6 +72,7 @@ def parallelize_dataframe(df, func, n_cores=None):
 def execute_main(func, tasks, count=None, backend=None):
     backend = backend if backend else DEFAULT_BACKEND
     if count is None:
+        import joblib
         count = int(joblib.cpu_count() * 1.3)
     else:
         count = int(count)
@@ -86,6 +91,7 @@ def data_persist(data, backend=None):
     backend = backend if backend else DEFAULT_BACKEND
     if backend == 'dask':
         from dask import dataframe
+        from .dask_utils import init_client
         init_client()
         return dataframe.from_pandas(data, chunksize=100000)
     return data
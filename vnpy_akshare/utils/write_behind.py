@@ -0,0 +1,69 @@
+import atexit
+import queue
+import threading
+
+from .log import log
+from .metrics import metrics
+
+
+class WriteBehind:
+    """
+    后台写入队列
+
+    写入任务在单个后台线程中按提交顺序执行，调用方不需要等待写入完成。
+    队列满时submit阻塞，避免未写入的数据无限占用内存。
+    进程退出时通过atexit调用close，等待队列中的任务全部写入。
+    """
+
+    def __init__(self, maxsize=64, name="WriteBehind"):
+        self.name = name
+        self.queue = queue.Queue(maxsize)
+        self.lock = threading.Lock()
+        self.thread = None
+        atexit.register(self.close)
+
+    def _start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+
+            func, args, kwargs = item
+            try:
+                func(*args, **kwargs)
+                metrics.inc("write_behind_total", result="done", queue=self.name)
+            except Exception:
+                metrics.inc("write_behind_total", result="failed", queue=self.name)
+                log.exception("%s: write failed" % self.name)
+            finally:
+                self.queue.task_done()
+
+    def submit(self, func, *args, **kwargs):
+        """提交写入任务，参数中的数据在写入前不应被修改"""
+        self._start()
+        self.queue.put((func, args, kwargs))
+
+    def flush(self):
+        """等待已提交的任务全部执行完成"""
+        if self.thread is not None:
+            self.queue.join()
+
+    def close(self):
+        """写入已提交的任务后停止后台线程，之后再submit时重新启动"""
+        with self.lock:
+            thread = self.thread
+            self.thread = None
+        if thread is not None and thread.is_alive():
+            self.queue.put(None)
+            thread.join()
+
+    def pending(self):
+        """尚未完成的任务数，包括正在执行的任务"""
+        return self.queue.unfinished_tasks
@@ -0,0 +1,221 @@
+import dataclasses
+import os
+import threading
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Callable, List, Optional, Tuple
+
+from vnpy.trader.constant import Interval
+from vnpy.trader.object import HistoryRequest
+from vnpy.trader.utility import extract_vt_symbol
+
+from .akshre_feed import AKShareDataFeed, FEEDS, get_trade_date, is_trading_day, last_closed_date
+from .setting import get_setting
+from .utils.log import log
+from .utils.metrics import metrics
+from .utils.misc import file2dict
+
+
+@dataclasses.dataclass
+class WarmTask:
+    """一个需要预热的代码"""
+    vt_symbol: str
+    interval: Interval = Interval.DAILY
+    days: int = 365
+    tick_days: int = 0
+
+
+@dataclasses.dataclass
+class WarmProgress:
+    total: int
+    done: int = 0
+    failed: int = 0
+    current: str = ""
+    start_time: datetime = dataclasses.field(default_factory=datetime.now)
+    errors: List[str] = dataclasses.field(default_factory=list)
+
+    @property
+    def finished(self) -> bool:
+        return self.done + self.failed >= self.total
+
+    @property
+    def percent(self) -> float:
+        return 100.0 * (self.done + self.failed) / self.total if self.total else 100.0
+
+
+def load_watchlist(path: str) -> List[WarmTask]:
+    """
+    读取json格式的自选列表，可以是代码列表，也可以是{"symbols": [...]}
+    列表中每一项为vt_symbol字符串，或包含vt_symbol、interval、days、tick_days的对象，
+    未指定的参数读取datafeed.akshare.warmer_interval、warmer_days、warmer_tick_days
+    """
+    data = file2dict(path)
+    if isinstance(data, dict):
+        data = data.get("symbols", [])
+
+    defaults = {
+        "interval": Interval(get_setting("warmer_interval", Interval.DAILY.value)),
+        "days": get_setting("warmer_days", 365),
+        "tick_days": get_setting("warmer_tick_days", 0),
+    }
+
+    tasks = []
+    for item in data:
+        if isinstance(item, str):
+            item = {"vt_symbol": item}
+        kwargs = dict(defaults, **item)
+        kwargs["interval"] = Interval(kwargs["interval"])
+        tasks.append(WarmTask(**kwargs))
+    return tasks
+
+
+def lower_thread_priority():
+    """降低当前线程的调度优先级，平台不支持时忽略"""
+    get_native_id = getattr(threading, "get_native_id", None)
+    if get_native_id is None or not hasattr(os, "setpriority"):
+        return
+    try:
+        os.setpriority(os.PRIO_PROCESS, get_native_id(), 19)
+    except OSError:
+        pass
+
+
+class CacheWarmer:
+    """
+    后台缓存预热
+
+    每个交易日收盘后按自选列表下载K线和Tick写入本地存储，第二天策略启动时直接读取本地数据。
+    预热在单个低优先级线程中顺序执行，请求同样经过上游限流，每个任务之间间隔pause秒，
+    给实时查询留出请求额度。
+    """
+
+    def __init__(self, feed: AKShareDataFeed = None, watchlist: str = None, at: str = None,
+                 pause: float = None, callback: Callable[[WarmProgress], None] = None):
+        """
+        :param watchlist: 自选列表文件，默认读取datafeed.akshare.warmer_watchlist
+        :param at: 每天开始预热的时间，如"16:30"，默认读取datafeed.akshare.warmer_time
+        :param pause: 任务间隔秒数，默认读取datafeed.akshare.warmer_pause
+        :param callback: 每完成一个任务调用一次，参数为WarmProgress
+        """
+        self.feed: AKShareDataFeed = feed if feed is not None else AKShareDataFeed()
+        self.watchlist: str = watchlist or get_setting("warmer_watchlist", "")
+        self.at: str = at or get_setting("warmer_time", "16:30")
+        self.pause: float = pause if pause is not None else get_setting("warmer_pause", 0.5)
+        self.callback: Optional[Callable[[WarmProgress], None]] = callback
+
+        # 其他需要预热的缓存，如Wrapper.get_price，每次预热在自选列表之后执行
+        self.jobs: List[Tuple[str, Callable[[], None]]] = []
+
+        self.progress: Optional[WarmProgress] = None
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def add_job(self, name: str, func: Callable[[], None]):
+        """
+        添加自定义预热任务，例如
+        warmer.add_job("jq_price", partial(Wrapper().get_price, securities, start_date, end_date, cached=True))
+        """
+        self.jobs.append((name, func))
+
+    def _report(self, progress: WarmProgress):
+        if self.callback is not None:
+            try:
+                self.callback(progress)
+            except Exception:
+                log.exception("warmer callback error")
+
+    def warm_task(self, task: WarmTask):
+        """下载单个代码的K线和Tick，结果只写入缓存"""
+        symbol, exchange = extract_vt_symbol(task.vt_symbol)
+        end = datetime.combine(last_closed_date(), datetime.min.time())
+
+        req = HistoryRequest(
+            symbol=symbol,
+            exchange=exchange,
+            start=end - timedelta(days=task.days),
+            end=end,
+            interval=task.interval
+        )
+        self.feed.query_bar_df(req)
+
+        if task.tick_days > 0:
+            feed = FEEDS.get(exchange)
+            days = get_trade_date(exchange, end - timedelta(days=task.tick_days * 3 + 10), end)[-task.tick_days:]
+            if feed is not None and days:
+                tick_req = HistoryRequest(symbol=symbol, exchange=exchange, start=days[0], end=days[-1])
+                feed.query_tick_by_day(tick_req, workers=1)
+
+    def run_once(self, tasks: List[WarmTask] = None) -> WarmProgress:
+        """立即预热一次，阻塞直到完成或stop被调用"""
+        if tasks is None:
+            tasks = load_watchlist(self.watchlist) if self.watchlist else []
+
+        jobs = [(task.vt_symbol, partial(self.warm_task, task)) for task in tasks] + self.jobs
+        progress = self.progress = WarmProgress(total=len(jobs))
+        log.info("cache warmer: start %d tasks" % len(jobs))
+
+        for name, func in jobs:
+            if self.stop_event.is_set():
+                break
+
+            progress.current = name
+            try:
+                func()
+                progress.done += 1
+                metrics.inc("warmer_tasks_total", result="done")
+            except Exception as ex:
+                progress.failed += 1
+                progress.errors.append("%s: %r" % (name, ex))
+                metrics.inc("warmer_tasks_total", result="failed")
+                log.warn("cache warmer: %s failed: %r" % (name, ex))
+            self._report(progress)
+
+            if self.pause > 0:
+                self.stop_event.wait(self.pause)
+
+        progress.current = ""
+        log.info("cache warmer: finished, done %d, failed %d, cost %s" % (
+            progress.done, progress.failed, datetime.now() - progress.start_time))
+        return progress
+
+    def next_run_time(self, now: datetime = None) -> datetime:
+        """下一个交易日的预热时间，今天的预热时间未到且今天是交易日时返回今天"""
+        if now is None:
+            now = datetime.now()
+
+        run_time = datetime.strptime(self.at, "%H:%M").time()
+        day = now.date() if now.time() < run_time else now.date() + timedelta(1)
+        # 交易日历只包含已经过去的交易日，未来的日期按周末和法定节假日判断
+        while not is_trading_day(day):
+            day += timedelta(1)
+        return datetime.combine(day, run_time)
+
+    def _run(self):
+        lower_thread_priority()
+        while not self.stop_event.is_set():
+            next_time = self.next_run_time()
+            log.info("cache warmer: next run at %s" % next_time)
+            # 分段等待，系统休眠或修改时间后也能按时触发
+            while not self.stop_event.is_set() and datetime.now() < next_time:
+                self.stop_event.wait(min((next_time - datetime.now()).total_seconds(), 60))
+            if self.stop_event.is_set():
+                break
+
+            try:
+                self.run_once()
+            except Exception:
+                log.exception("cache warmer error")
+
+    def start(self):
+        """在后台线程中按计划预热"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="CacheWarmer", daemon=True)
+        self.thread.start()
+
+    def stop(self, wait: bool = True):
+        self.stop_event.set()
+        if wait and self.thread is not None:
+            self.thread.join()
+        self.thread = None
@@ -0,0 +1,295 @@
+import bisect
+import datetime as dt
+import json
+import os
+import threading
+
+import pandas as pd
+
+import vnpy_akshare.utils.date_utils as du
+
+
+def _day_strs(days):
+    return set(pd.DatetimeIndex(days).strftime("%Y-%m-%d"))
+
+
+def _next_trade_day(day):
+    '''day之后的第一个交易日，day本身不是交易日时同样适用'''
+    day += dt.timedelta(1)
+    while not du.is_trade_date(day):
+        day += dt.timedelta(1)
+    return day
+
+
+class Coverage(object):
+    '''
+    已缓存交易日的区间集合，区间按日期排序且互不重叠，只相隔非交易日的区间会被合并
+    '''
+
+    def __init__(self, ranges=None):
+        self.starts = []
+        self.ends = []
+        for start, end in ranges or []:
+            self.add(start, end)
+
+    def add(self, start, end):
+        start = du.to_date(start)
+        end = du.to_date(end)
+        if start > end:
+            return
+
+        # 与[start, end]重叠或相邻的区间合并为一个
+        i = bisect.bisect_left(self.ends, start)
+        if i > 0 and _next_trade_day(self.ends[i - 1]) >= start:
+            i -= 1
+        j = i
+        while j < len(self.starts) and self.starts[j] <= _next_trade_day(end):
+            start = min(start, self.starts[j])
+            end = max(end, self.ends[j])
+            j += 1
+        self.starts[i:j] = [start]
+        self.ends[i:j] = [end]
+
+    def covers(self, day):
+        i = bisect.bisect_right(self.starts, day) - 1
+        return i >= 0 and day <= self.ends[i]
+
+    def ranges(self):
+        return list(zip(self.starts, self.ends))
+
+    def to_list(self):
+        return [[du.to_str(start), du.to_str(end)] for start, end in self.ranges()]
+
+    @classmethod
+    def from_list(cls, ranges):
+        return cls([(du.to_date(start), du.to_date(end)) for start, end in ranges])
+
+
+class DayCacheBackend(object):
+    '''
+    逐日缓存，每个交易日一条记录，通过wrap.get_cache/put_cache读写，key由gen_key(day)生成
+    gen_key有cache_prefix属性时，已缓存的区间同样保存在缓存中，key为coverage_加cache_prefix
+    '''
+
+    COVERAGE_KEY_PREFIX = "coverage_"
+    # 每次读写都会新建DayCacheBackend，锁由所有实例共用
+    _lock = threading.Lock()
+
+    def __init__(self, wrap):
+        self.wrap = wrap
+
+    def get_coverage(self, gen_key):
+        '''已缓存的区间，没有记录时返回None'''
+        prefix = getattr(gen_key, "cache_prefix", None)
+        if prefix is None:
+            return None
+        ranges = self.wrap.get_cache(self.COVERAGE_KEY_PREFIX + prefix)
+        return Coverage.from_list(ranges) if ranges is not None else None
+
+    def _coverage_item(self, gen_key, ranges):
+        '''合并ranges后的清单，返回(key, value)，不需要更新时返回None'''
+        prefix = getattr(gen_key, "cache_prefix", None)
+        if prefix is None or not ranges:
+            return None
+        coverage = self.get_coverage(gen_key) or Coverage()
+        for start, end in ranges:
+            coverage.add(start, end)
+        return self.COVERAGE_KEY_PREFIX + prefix, coverage.to_list()
+
+    def add_coverage(self, gen_key, ranges):
+        with self._lock:
+            item = self._coverage_item(gen_key, ranges)
+            if item is not None:
+                self.wrap.put_cache(*item)
+
+    def load(self, gen_key, days):
+        '''
+        读取days的缓存
+        :param days: 交易日列表
+        :return: (DataFrame列表, 有数据的日期字符串集合)
+        '''
+        frames = []
+        present = set()
+        for day in days:
+            d = self.wrap.get_cache(gen_key(day))
+            if d is not None and len(d) > 0:
+                frames.append(d)
+                present.add(du.to_str(day))
+        return frames, present
+
+    def save(self, gen_key, data, ranges=()):
+        '''
+        按date列分组写入，已有的日期被覆盖
+        :param ranges: 写入后标记为已缓存的区间
+        '''
+        items = [(gen_key(d), group) for d, group in data.groupby(by="date")]
+        with self._lock:
+            # 清单与数据一起批量写入
+            item = self._coverage_item(gen_key, ranges)
+            if item is not None:
+                items.append(item)
+            self.wrap.put_cache_many(items)
+
+
+class ParquetCacheBackend(object):
+    '''
+    列式缓存，按gen_key.cache_prefix分目录，每年一个Parquet文件
+
+    读取区间时每年只读一个文件，按date列过滤，文件按date排序以便跳过区间外的行组。
+    date列保存为datetime64，读出的数据date列同样为datetime64。
+    每个目录下的coverage.json记录已缓存的区间。
+    '''
+
+    COVERAGE_FILE = "coverage.json"
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._prefix_locks = {}
+
+    def _prefix_dir(self, gen_key):
+        return os.path.join(self.root, gen_key.cache_prefix)
+
+    def _prefix_lock(self, path):
+        with self._lock:
+            lock = self._prefix_locks.get(path)
+            if lock is None:
+                lock = self._prefix_locks[path] = threading.RLock()
+            return lock
+
+    def get_coverage(self, gen_key):
+        '''已缓存的区间，没有记录时返回None'''
+        path = os.path.join(self._prefix_dir(gen_key), self.COVERAGE_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return Coverage.from_list(json.load(f))
+
+    def add_coverage(self, gen_key, ranges):
+        if not ranges:
+            return
+        path = self._prefix_dir(gen_key)
+        with self._prefix_lock(path):
+            os.makedirs(path, exist_ok=True)
+            coverage = self.get_coverage(gen_key) or Coverage()
+            for start, end in ranges:
+                coverage.add(start, end)
+
+            file = os.path.join(path, self.COVERAGE_FILE)
+            tmp = file + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(coverage.to_list(), f)
+            os.replace(tmp, file)
+
+    def load(self, gen_key, days):
+        '''
+        读取days的缓存
+        :param days: 交易日列表
+        :return: (DataFrame列表, 有数据的日期字符串集合)
+        '''
+        if len(days) == 0:
+            return [], set()
+
+        day_index = pd.DatetimeIndex(days)
+        start, end = day_index.min(), day_index.max()
+        path = self._prefix_dir(gen_key)
+
+        frames = []
+        with self._prefix_lock(path):
+            for year in range(start.year, end.year + 1):
+                file = os.path.join(path, "%d.parquet" % year)
+                if os.path.exists(file):
+                    frames.append(pd.read_parquet(file, filters=[("date", ">=", start), ("date", "<=", end)]))
+
+        frames = [d for d in frames if len(d) > 0]
+        if not frames:
+            return [], set()
+
+        data = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        # 区间内不需要读取的日期，如cache_end为False时的最后一天
+        data = data[data["date"].isin(day_index)].reset_index(drop=True)
+        if len(data) == 0:
+            return [], set()
+        return [data], _day_strs(data["date"].unique())
+
+    def save(self, gen_key, data, ranges=()):
+        '''
+        按年合并写入，同一code、date的旧数据被覆盖
+        :param ranges: 写入后标记为已缓存的区间
+        '''
+        path = self._prefix_dir(gen_key)
+        data = data.copy()
+        data["date"] = pd.to_datetime(data["date"])
+        with self._prefix_lock(path):
+            os.makedirs(path, exist_ok=True)
+            for year, group in data.groupby(data["date"].dt.year):
+                file = os.path.join(path, "%d.parquet" % year)
+                if os.path.exists(file):
+                    group = pd.concat([pd.read_parquet(file), group], ignore_index=True)
+                    group = group.drop_duplicates(["code", "date"], keep="last")
+                group = group.sort_values(["date", "code"]).reset_index(drop=True)
+
+                tmp = file + ".tmp"
+                group.to_parquet(tmp, index=False)
+                os.replace(tmp, file)
+            self.add_coverage(gen_key, ranges)
+
+    def clear(self, gen_key=None):
+        '''删除gen_key对应的缓存，gen_key为None时删除全部'''
+        path = self._prefix_dir(gen_key) if gen_key is not None else self.root
+        with self._prefix_lock(path):
+            for parent, _, files in os.walk(path):
+                for name in files:
+                    if name.endswith(".parquet") or name == self.COVERAGE_FILE:
+                        os.remove(os.path.join(parent, name))
+
+
+class PendingWrites(object):
+    '''
+    已提交到后台写入队列、尚未写入缓存的数据，按key和交易日索引
+    写入完成前读取缓存时从这里取数，这些日期不会被当作缺失重新下载
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def add(self, key, data):
+        '''登记按date列分组的data，返回remove使用的标记'''
+        groups = {du.to_str(d): group for d, group in data.groupby(by="date")}
+        token = object()
+        with self._lock:
+            self._entries.setdefault(key, []).append((token, groups))
+        return token
+
+    def remove(self, key, token):
+        with self._lock:
+            entries = [entry for entry in self._entries.get(key, []) if entry[0] is not token]
+            if entries:
+                self._entries[key] = entries
+            else:
+                self._entries.pop(key, None)
+
+    def snapshot(self, key):
+        '''
+        key下当前待写入的数据，按提交顺序排列
+        应在读取已缓存区间之前获取，之后完成的写入仍在快照中，之前完成的写入已在缓存中
+        '''
+        with self._lock:
+            return [groups for _, groups in self._entries.get(key, [])]
+
+    @staticmethod
+    def load(snapshot, days):
+        '''
+        从snapshot中读取days的数据，同一天有多份时使用最后提交的
+        :return: (DataFrame列表, 有数据的日期字符串集合)
+        '''
+        frames = []
+        present = set()
+        wanted = [du.to_str(day) for day in days]
+        for groups in reversed(snapshot):
+            for day in wanted:
+                if day not in present and day in groups:
+                    frames.append(groups[day])
+                    present.add(day)
+        return frames, present
@@ -1,28 +1,62 @@
+import datetime as dt
 import math
 import os
 import pathlib
-from collections import Iterable
+from collections.abc import Iterable
 from functools import lru_cache
 
-import akshare as ak
 import numpy as np
 import pandas as pd
-from diskcache import Cache
 
+import vnpy_akshare.upstream as upstream
 import vnpy_akshare.utils.date_utils as du
+from vnpy_akshare.setting import get_setting
+from vnpy_akshare.utils.compact import compact_df
 from vnpy_akshare.utils.execpt import except_method
 from vnpy_akshare.utils.log import cache_path as get_cache_path, info_path as get_info_path
+from vnpy_akshare.utils.misc import cached_classproperty
+from .cache_backend import ParquetCacheBackend
 from .wrap import Wrap, Type
 
 
 class Wrapper(Wrap):
-    cache_path = get_cache_path("cache")
-    info_path = get_info_path("jq.json")
-
     _parent = os.path.dirname(os.path.dirname(__file__))
-    _cache = Cache(cache_path)
     _cache_expire = 80 * 365 * 24 * 60 * 60
 
+    # get_price默认字段，复权因子用于在本地计算前复权和不复权价格
+    price_fields = ("open", "close", "high", "low", "volume", "money")
+    adjust_price_fields = ("open", "close", "high", "low", "avg", "pre_close", "high_limit", "low_limit")
+    price_decimals = 2
+
+    # 路径和缓存在第一次使用时创建，导入模块时不创建目录和打开缓存
+    @cached_classproperty
+    def cache_path(cls):
+        return get_cache_path("cache")
+
+    @cached_classproperty
+    def info_path(cls):
+        return get_info_path("jq.json")
+
+    @cached_classproperty
+    def _cache(cls):
+        from diskcache import Cache
+        return Cache(cls.cache_path)
+
+    @cached_classproperty
+    def write_behind(cls):
+        """datafeed.akshare.wrap_write_behind为True时新下载的数据在后台写入缓存"""
+        return get_setting("wrap_write_behind", False)
+
+    @cached_classproperty
+    def cache_backend(cls):
+        """
+        datafeed.akshare.wrap_cache_backend为"parquet"时按年保存为Parquet文件，默认逐日保存在diskcache
+        两种方式的缓存互不共用，切换后需要重新下载
+        """
+        if get_setting("wrap_cache_backend", "diskcache") == "parquet":
+            return ParquetCacheBackend(get_setting("wrap_cache_parquet_path", get_cache_path("wrap")))
+        return None
+
     def __new__(cls, *args, **kwargs):
         if '_instance' not in vars(cls):
             cls._instance = super().__new__(cls)
@@ -38,16 +72,21 @@ class Wrapper(Wrap):
 
     @staticmethod
     @except_method(try_count=5)
-    def _get_data(func) -> pd.DataFrame:
-        return func()
+    def _get_data(func, *args, **kwargs) -> pd.DataFrame:
+        return upstream.call("jq." + func.__name__, func, *args, **kwargs)
 
     @lru_cache()
-    def _get_gen_price_key(self, frequency, fq, prefix=None):
+    def _get_gen_price_key(self, frequency, fq, prefix=None, compact=False):
+        # 压缩类型的数据单独缓存
+        suffix = "_compact" if compact else ""
+
         def gen_key(day):
             if prefix:
-                return prefix + "_" + frequency + "_" + du.to_str(day) + "_" + fq
-            return frequency + "_" + du.to_str(day) + "_" + fq
+                return prefix + "_" + frequency + "_" + du.to_str(day) + "_" + fq + suffix
+            return frequency + "_" + du.to_str(day) + "_" + fq + suffix
 
+        # 不含日期的部分，用作结果缓存的key
+        gen_key.cache_prefix = "_".join(p for p in (prefix, frequency, fq) if p) + suffix
         return gen_key
 
     @lru_cache()
@@ -55,6 +94,7 @@ class Wrapper(Wrap):
         def gen_key(day):
             return "fund_" + du.to_str(day)
 
+        gen_key.cache_prefix = "fund"
         return gen_key
 
     def filter_stocks(self, start_date, end_date, need):
@@ -70,12 +110,12 @@ class Wrapper(Wrap):
         return iter_securities
 
     @lru_cache()
-    def _get_and_process_price_data(self, frequency, fields, fq):
+    def _get_and_process_price_data(self, frequency, fields, fq, compact=False):
         def get_and_process_data(securities, start_date, end_date):
             d = Wrapper._get_data(
-                lambda: jq.get_price(
-                    securities, start_date=start_date, end_date=end_date,
-                    frequency=frequency, fields=fields, skip_paused=True, fq=fq, panel=False))
+                jq.get_price,
+                securities, start_date=start_date, end_date=end_date,
+                frequency=frequency, fields=fields, skip_paused=True, fq=fq, panel=False)
             d = d.dropna()
             if "time" in d.columns:
                 d.rename(columns={"time": "date"}, inplace=True)
@@ -83,8 +123,11 @@ class Wrapper(Wrap):
                 d["date"] = d.index
             d.date = d.date.apply(lambda dd: du.to_date(dd))
             d = d.reset_index(drop=True)
+            if compact:
+                d = compact_df(d)
             return d
 
+        get_and_process_data.descriptor = ("price", frequency, fields, fq, compact)
         return get_and_process_data
 
     @lru_cache()
@@ -138,6 +181,7 @@ class Wrapper(Wrap):
             d = d.reset_index(drop=True)
             return d
 
+        get_and_process_data.descriptor = ("fundamentals",)
         return get_and_process_data
 
     def get_cache(self, key):
@@ -146,12 +190,19 @@ class Wrapper(Wrap):
     def put_cache(self, key, value):
         self._cache.set(key, value, self._cache_expire)
 
+    def put_cache_many(self, items):
+        # 一个事务内写入，只提交一次
+        with self._cache.transact():
+            for key, value in items:
+                self._cache.set(key, value, self._cache_expire)
+
     @except_method(try_count=3)
     def get_cached_daily_data(self, *args, **kwargs):
         return super().get_cached_daily_data(*args, **kwargs)
 
     def get_price(self, security: str or list, start_date=None, end_date=None, frequency='daily', dtype=None,
-                  fields=None, fq='pre', count=None, cached=False, cache_end=False, update_all=False, filter=True):
+                  fields=None, fq='pre', count=None, cached=False, cache_end=False, update_all=False, filter=True,
+                  compact=False, pre_factor_ref_date=None):
         if type(security) is str:
             security = [security]
         security = list(set(security))
@@ -168,7 +219,7 @@ class Wrapper(Wrap):
                 dtype = dtype[0]
             dtype_list = [dtype]
             key_prefix = dtype
-        all_stocks = Wrapper._get_data(lambda: jq.get_all_securities(dtype_list))
+        all_stocks = Wrapper._get_data(jq.get_all_securities, dtype_list)
         all_stock_list = list(all_stocks[all_stocks.type == dtype].index)
         all_securities = list(all_stocks.index)
         if len(set(security) & set(all_securities)) == 0:
@@ -182,24 +233,78 @@ class Wrapper(Wrap):
         if start_date is None:
             start_date = du.next_trade_day(end_date, 1 - count)
 
-        gen_key = self._get_gen_price_key(frequency, fq, prefix=key_prefix)
+        # 只下载和缓存一份后复权数据及复权因子，各复权方式在本地计算
+        request_fields = tuple(sorted(set(fields or self.price_fields) | {"factor"}))
+        gen_key = self._get_gen_price_key(frequency, "post_factor", prefix=key_prefix, compact=compact)
         filter_stocks = self.filter_stocks
-        get_and_process_data = self._get_and_process_price_data(frequency, fields, fq)
+        get_and_process_data = self._get_and_process_price_data(frequency, request_fields, "post", compact)
         all_data = self.get_cached_daily_data(
             start_date, end_date, gen_key, filter_stocks, get_and_process_data, cached, cache_end, update_all)
 
         if all_data is None:
             all_data = pd.DataFrame(
                 columns=['date', 'code', 'open', 'high', 'low', 'close', 'volume'])
+            return all_data
+
+        all_data = self._adjust_price(all_data, fq, pre_factor_ref_date)
+        if not fields or "factor" not in fields:
+            all_data = all_data.drop(columns="factor")
+        if compact:
+            # 拼接后各日的category不一致，重新统一
+            all_data = compact_df(all_data)
         return all_data
 
+    @lru_cache()
+    def _get_ref_factors(self, codes, ref_date):
+        """
+        各代码在ref_date及之前最后一个交易日的后复权因子
+        :param codes: 代码tuple
+        :param ref_date: 日期字符串
+        :return: 以代码为索引的Series
+        """
+        d = Wrapper._get_data(
+            jq.get_price,
+            list(codes), end_date=ref_date, count=1, frequency="daily",
+            fields=["factor"], skip_paused=False, fq="post", panel=False)
+        d = d.dropna(subset=["factor"])
+        return d.groupby("code")["factor"].last()
+
+    def _adjust_price(self, data, fq, pre_factor_ref_date=None):
+        """
+        由后复权价格和复权因子计算指定复权方式的价格
+        前复权以pre_factor_ref_date（默认今天）为基准，与聚宽一致，结果不随查询区间变化：
+        价格 = 后复权价格 / 基准因子，成交量 = 后复权成交量 * 基准因子
+        """
+        if fq == "post" or len(data) == 0:
+            return data
+
+        factor = data["factor"].to_numpy(dtype=np.float64)
+        if fq == "pre":
+            ref_date = du.to_str(pre_factor_ref_date or dt.date.today())
+            codes = tuple(sorted(data["code"].unique()))
+            ref_factors = self._get_ref_factors(codes, ref_date)
+            # 数据已按code、date排序，取不到基准因子的代码以区间内最后一个因子为基准
+            last = data.groupby("code", observed=True)["factor"].transform("last")
+            base = data["code"].map(ref_factors).astype(np.float64).fillna(last).to_numpy(dtype=np.float64)
+        else:
+            base = factor
+
+        data = data.copy()
+        for name in self.adjust_price_fields:
+            if name in data.columns:
+                data[name] = np.round(data[name].to_numpy(dtype=np.float64) / base, self.price_decimals)
+        if "volume" in data.columns:
+            data["volume"] = np.round(data["volume"].to_numpy(dtype=np.float64) * base)
+        data["factor"] = factor / base
+        return data
+
     def get_fund_price(self, security: str or list, start_date=None, end_date=None, frequency='daily',
                        fields=None, fq='pre', count=None, cached=False, cache_end=False, update_all=False, filter=True):
         if type(security) is str:
             security = [security]
         security = list(set(security))
         security = self.get_symbol(security)
-        all_stocks = Wrapper._get_data(lambda: jq.get_all_securities(["fund"]))
+        all_stocks = Wrapper._get_data(jq.get_all_securities, ["fund"])
         # all_stock_list = list(all_stocks[all_stocks.type == "stock"].index)
         all_stock_list = all_securities = list(all_stocks.index)
         if len(set(security) & set(all_securities)) == 0:
@@ -231,7 +336,7 @@ class Wrapper(Wrap):
             security = [security]
         security = list(set(security))
         security = self.get_symbol(security)
-        all_stocks = Wrapper._get_data(lambda: jq.get_all_securities(["stock"]))
+        all_stocks = Wrapper._get_data(jq.get_all_securities, ["stock"])
         all_securities = list(all_stocks.index)
 
         self._all_stocks = all_stocks
@@ -268,7 +373,7 @@ class Wrapper(Wrap):
         if type(dtype) is not list:
             dtype = [dtype]
         t_dtype = self._get_type(dtype, self.type_map)
-        ret = Wrapper._get_data(lambda: jq.get_all_securities(t_dtype, date))
+        ret = Wrapper._get_data(jq.get_all_securities, t_dtype, date)
         ret["start_date"] = ret["start_date"].apply(lambda d: du.to_date(d))
         ret["end_date"] = ret["end_date"].apply(lambda d: du.to_date(d))
         ret["type"] = self._rev_type(ret["type"], Wrapper.type_map)
@@ -289,10 +394,10 @@ class Wrapper(Wrap):
         return [c[:6] for c in code]
 
     def rev_cov(self, a: str or list, dtype="1"):
-        if type(a) is not str and type(a) is not np.str and isinstance(a, Iterable):
+        if type(a) is not str and type(a) is not np.str_ and isinstance(a, Iterable):
             dtype = a[1]
             a: str = a[0]
-        if type(a) is str or type(a) is np.str:
+        if type(a) is str or type(a) is np.str_:
             num = a[:6] if '0' <= a[0] <= '9' else a[-6:]
             if num.startswith("399") or a.count(".XSHG") > 0 and num.startswith("0"):
                 return num, Type.INDEX
@@ -314,7 +419,7 @@ class Wrapper(Wrap):
 
     def get_index_weight(self, index, date=None):
         index = self.get_symbol(index)
-        ret = Wrapper._get_data(lambda: jq.get_index_weights(index, date))
+        ret = Wrapper._get_data(jq.get_index_weights, index, date)
         if "code" not in ret.columns:
             ret["code"] = ret.index
         ret["code"] = self.make_symbol(ret["code"].values)
@@ -1,14 +1,51 @@
 import datetime as dt
-from collections import Iterable
+import threading
+from collections.abc import Iterable
 from enum import Enum, unique
-from functools import lru_cache
 
 import numpy as np
 import pandas as pd
 
 import vnpy_akshare.utils.date_utils as du
+from vnpy_akshare.setting import get_setting
 from vnpy_akshare.utils.log import log
+from vnpy_akshare.utils.metrics import metrics
+from vnpy_akshare.utils.result_cache import ResultCache
 from vnpy_akshare.utils.thread_util import parallelize_dataframe
+from vnpy_akshare.utils.write_behind import WriteBehind
+from .cache_backend import DayCacheBackend, PendingWrites
+
+RESULT_CACHE_BYTES = 256 * 1024 * 1024
+
+_result_cache = None
+_write_behind = None
+_init_lock = threading.Lock()
+# 后台写入队列中尚未写入缓存的数据
+_pending_writes = PendingWrites()
+
+
+def get_write_behind() -> WriteBehind:
+    """
+    get_cached_data的后台写入队列，所有Wrap共用
+    队列长度通过datafeed.akshare.write_behind_queue修改
+    """
+    global _write_behind
+    with _init_lock:
+        if _write_behind is None:
+            _write_behind = WriteBehind(get_setting("write_behind_queue", 64), "WrapWriteBehind")
+    return _write_behind
+
+
+def get_result_cache() -> ResultCache:
+    """
+    get_cached_data的进程内结果缓存，所有Wrap共用
+    大小通过datafeed.akshare.result_cache_bytes修改，0表示不缓存
+    """
+    global _result_cache
+    with _init_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache(get_setting("result_cache_bytes", RESULT_CACHE_BYTES))
+    return _result_cache
 
 
 @unique
@@ -26,6 +63,11 @@ class Type(Enum):
 
 
 class Wrap(object):
+    # 批量读写的缓存，如ParquetCacheBackend，None表示逐日读写
+    cache_backend = None
+    # 为True时新下载的数据在后台线程写入缓存，不阻塞返回
+    write_behind = False
+
     def get_buy_code(self, code):
         return code
 
@@ -48,10 +90,61 @@ class Wrap(object):
     def put_cache(self, key, value):
         pass
 
-    @lru_cache(maxsize=2 ** 32)
+    def put_cache_many(self, items):
+        '''
+        批量写入[(key, value), ...]，子类可以在一个事务中完成
+        '''
+        for key, value in items:
+            self.put_cache(key, value)
+
+    def get_cache_backend(self, gen_key):
+        '''
+        get_cached_data读写缓存的方式
+        cache_backend不为None且gen_key有cache_prefix属性时使用cache_backend，否则逐日调用get_cache/put_cache
+        '''
+        if self.cache_backend is not None and hasattr(gen_key, "cache_prefix"):
+            return self.cache_backend
+        return DayCacheBackend(self)
+
+    def get_result_key(self, gen_key, get_and_process_data):
+        '''
+        结果缓存的key，由gen_key.cache_prefix和get_and_process_data.descriptor组成，
+        没有这两个属性时使用函数本身
+        '''
+        return (type(self).__name__,
+                getattr(gen_key, "cache_prefix", gen_key),
+                getattr(get_and_process_data, "descriptor", get_and_process_data))
+
+    def get_pending_key(self, gen_key):
+        '''后台写入中的数据按缓存位置区分，由Wrap类型和gen_key.cache_prefix组成'''
+        return type(self).__name__, getattr(gen_key, "cache_prefix", gen_key)
+
+    def _save_behind(self, backend, gen_key, data, ranges, pending_key, token):
+        '''在后台线程中写入缓存，完成或失败后不再作为待写入数据'''
+        try:
+            backend.save(gen_key, data, ranges)
+        finally:
+            _pending_writes.remove(pending_key, token)
+
     def get_cached_data(self, start_date, end_date, gen_key, filter_stocks,
                         get_and_process_data, cached, cache_end, update_all, split_year=True):
+        result_cache = get_result_cache()
+        key = self.get_result_key(gen_key, get_and_process_data)
+        universe = frozenset(filter_stocks(start_date, end_date, False))
+        if not update_all:
+            all_data = result_cache.get(key, start_date, end_date, universe)
+            if all_data is not None:
+                return all_data
+
+        all_data = self._load_cached_data(start_date, end_date, gen_key, filter_stocks,
+                                          get_and_process_data, cached, cache_end, update_all, split_year)
+        # 不缓存最后一天的数据时，当天的数据可能还会变化，不放入结果缓存
+        if cache_end or du.to_date(end_date).date() < dt.date.today():
+            result_cache.put(key, start_date, end_date, all_data, universe)
+        return all_data
 
+    def _load_cached_data(self, start_date, end_date, gen_key, filter_stocks,
+                          get_and_process_data, cached, cache_end, update_all, split_year=True):
         if split_year:
             years = [dt.date(year=y, month=1, day=1) for y in range(start_date.year + 1, end_date.year)]
         else:
@@ -59,67 +152,104 @@ class Wrap(object):
         years.insert(0, start_date)
         years.append(end_date)
 
+        backend = self.get_cache_backend(gen_key)
+        # 待写入数据的快照须在读取清单之前获取
+        pending = _pending_writes.snapshot(self.get_pending_key(gen_key)) \
+            if cached and not update_all and self.write_behind else []
+        # 已缓存区间的清单，缺少的日期由清单计算，不需要逐日查询缓存
+        coverage = backend.get_coverage(gen_key) if cached and not update_all else None
+        loaded = set()
         all_data = []
         lack_dates = []
-        for i in range(len(years) - 1):
-            start = years[i]
-            end = years[i + 1] if i == len(years) - 2 else years[i + 1] - dt.timedelta(1)
-
-            start_d = None
-            end_d = None
-            if update_all:
-                start_d = start
-                end_d = end
-            else:
-                for day in du.trade_range(start, end):
-                    key = gen_key(day)
-                    d = self.get_cache(key) if cached and (day != end_date or cache_end) else None
-                    if d is None or len(d) == 0:
-                        if start_d is None:
-                            start_d = day
-                        end_d = day
-                    elif end_d is not None:
-                        lack_dates.append([start_d, end_d])
-                        start_d = end_d = None
-                    if d is not None:
-                        if len(d) > 0:
-                            all_data.append(d)
-            if end_d is not None:
-                lack_dates.append([start_d, end_d])
+        hits = misses = 0
+        with metrics.timer("stage_seconds", op="wrap", stage="cache_read"):
+            for i in range(len(years) - 1):
+                start = years[i]
+                end = years[i + 1] if i == len(years) - 2 else years[i + 1] - dt.timedelta(1)
+
+                start_d = None
+                end_d = None
+                if update_all:
+                    start_d = start
+                    end_d = end
+                else:
+                    days = list(du.trade_range(start, end))
+                    read_days = [day for day in days if day != end_date or cache_end] if cached else []
+                    if coverage is not None:
+                        read_days = [day for day in read_days if coverage.covers(day)]
+                    # 清单中已缓存但读取不到的日期，如缓存被淘汰，同样需要重新下载
+                    frames, present = backend.load(gen_key, read_days) if read_days else ([], set())
+                    all_data.extend(frames)
+                    hits += len(present)
+                    loaded |= present
+                    if pending:
+                        # 已下载但仍在后台写入队列中的日期
+                        pending_days = [day for day in days
+                                        if (day != end_date or cache_end) and du.to_str(day) not in present]
+                        frames, pending_present = PendingWrites.load(pending, pending_days)
+                        all_data.extend(frames)
+                        hits += len(pending_present)
+                        present = present | pending_present
+                    for day in days:
+                        if du.to_str(day) not in present:
+                            misses += 1
+                            if start_d is None:
+                                start_d = day
+                            end_d = day
+                        elif end_d is not None:
+                            lack_dates.append([start_d, end_d])
+                            start_d = end_d = None
+                if end_d is not None:
+                    lack_dates.append([start_d, end_d])
+        if cached and coverage is None and loaded:
+            # 没有清单时由逐日读取的结果补建
+            backend.add_coverage(gen_key, [(day, day) for day in loaded])
+        if cached:
+            metrics.inc("cache_hits_total", hits, cache="wrap")
+            metrics.inc("cache_misses_total", misses, cache="wrap")
 
         log.info("get_cached_daily_data: lack_dates: %s" % lack_dates)
-        for date in lack_dates:
-            iter_securities = filter_stocks(date[0], date[1], False)
-            if len(iter_securities) > 0:
-                single_data = get_and_process_data(iter_securities, date[0], date[1])
-                if single_data is not None and len(single_data) > 0:
-                    all_data.append(single_data)
+        with metrics.timer("stage_seconds", op="wrap", stage="fetch"):
+            for date in lack_dates:
+                iter_securities = filter_stocks(date[0], date[1], False)
+                if len(iter_securities) > 0:
+                    single_data = get_and_process_data(iter_securities, date[0], date[1])
+                    if single_data is not None and len(single_data) > 0:
+                        all_data.append(single_data)
 
         if len(all_data) == 0:
             return None
-        else:
+        with metrics.timer("stage_seconds", op="wrap", stage="concat"):
             all_data = pd.concat(all_data)
-        all_data = all_data.drop_duplicates(["code", "date"], keep='first')
-        all_data = all_data.sort_values(["code", "date"], ascending=True).reset_index(drop=True)
-
-        if cached:
-            all_lack_dates = []
-            for date in lack_dates:
-                all_lack_dates.extend([i for i in du.trade_range(date[0], date[1])])
-            if len(all_lack_dates) > 0:
-                all_dates = all_data["date"].unique()
-                func = None
-                if type(all_dates[0]) == str or type(all_dates[0]) == np.str:
-                    func = du.to_str
-                if type(all_lack_dates[0]) == dt.datetime or type(all_dates[0]) == np.datetime64:
-                    func = np.datetime64
-                if func is not None:
-                    all_lack_dates = [func(d) for d in all_lack_dates]
-                all_lack_dates = np.asarray(all_lack_dates)
-                data_save = all_data[all_data["date"].isin(all_lack_dates)]
-                for d, group in data_save.groupby(by="date"):
-                    key = gen_key(d)
-                    self.put_cache(key, group)
+            all_data = all_data.drop_duplicates(["code", "date"], keep='first')
+            all_data = all_data.sort_values(["code", "date"], ascending=True).reset_index(drop=True)
+        metrics.count_frame(all_data, op="wrap")
+
+        with metrics.timer("stage_seconds", op="wrap", stage="cache_write"):
+            if cached:
+                all_lack_dates = []
+                for date in lack_dates:
+                    all_lack_dates.extend([i for i in du.trade_range(date[0], date[1])])
+                if len(all_lack_dates) > 0:
+                    all_dates = all_data["date"].unique()
+                    func = None
+                    if type(all_dates[0]) == str or type(all_dates[0]) == np.str_:
+                        func = du.to_str
+                    if type(all_lack_dates[0]) == dt.datetime or type(all_dates[0]) == np.datetime64:
+                        func = np.datetime64
+                    if func is not None:
+                        all_lack_dates = [func(d) for d in all_lack_dates]
+                    all_lack_dates = np.asarray(all_lack_dates)
+                    data_save = all_data[all_data["date"].isin(all_lack_dates)]
+                    if self.write_behind:
+                        # 调用方可能修改返回的数据，写入的数据单独复制一份
+                        data_save = data_save.copy()
+                        pending_key = self.get_pending_key(gen_key)
+                        token = _pending_writes.add(pending_key, data_save)
+                        get_write_behind().submit(self._save_behind, backend, gen_key, data_save, lack_dates,
+                                                  pending_key, token)
+                    else:
+                        backend.save(gen_key, data_save, lack_dates)
         return all_data
 
     def get_cached_daily_data(self, start_date, end_date, gen_key, filter_stocks,
@@ -147,7 +277,7 @@ class Wrap(object):
 
     def get_price(self, security, start_date=None, end_date=None, frequency='daily', dtype=None,
                   fields=None, fq='pre', count=None, cached=True, cache_end=False,
-                  update_all=False, filter=True) -> pd.DataFrame:
+                  update_all=False, filter=True, compact=False, pre_factor_ref_date=None) -> pd.DataFrame:
         '''
         获取价格
         :param security:
@@ -159,6 +289,8 @@ class Wrap(object):
         :param count:
         :param cached:
         :param cache_end:
+        :param compact: 压缩列类型以节省内存，见compact_df
+        :param pre_factor_ref_date: 前复权的基准日期，默认为今天
         :return:
         '''
         pass
@@ -215,7 +347,7 @@ class Wrap(object):
 
         ret = []
         for sec in security:
-            if type(sec) is str or type(sec) is np.str:
+            if type(sec) is str or type(sec) is np.str_:
                 code = sec[:6] if '0' <= sec[0] <= '9' else sec[-6:]
                 d_type = Type.STOCK
                 if len(sec) == 6:
@@ -228,7 +360,7 @@ class Wrap(object):
                             d_type = e
                             break
                 else:
-                    if type(sec) is str or type(sec) is np.str:
+                    if type(sec) is str or type(sec) is np.str_:
                         for n, e in Type.__members__.items():
                             if sec.endswith(e.value):
                                 d_type = e